@@ -0,0 +1,67 @@
+"""
+Сравнение синхронных эндпоинтов объявлений под WSGI с асинхронными под ASGI.
+
+Серверы запускаются отдельно, например:
+    gunicorn config.wsgi -w 4 --threads 8 -b 127.0.0.1:8000
+    uvicorn config.asgi:application --workers 4 --port 8001
+
+    python benchmarks/asgi_vs_wsgi.py --wsgi http://127.0.0.1:8000 --asgi http://127.0.0.1:8001 \\
+        --token <JWT> --ad-id 1 --concurrency 200 --duration 30
+
+Прогоняются три варианта: синхронные эндпоинты под WSGI, те же эндпоинты под ASGI
+(через sync_to_async) и асинхронные эндпоинты под ASGI. Синхронная лента отдается
+из кэша страниц, поэтому честнее всего сравнивать просмотр объявления.
+"""
+import argparse
+import asyncio
+import json
+
+from loadgen import run_load
+
+SCENARIOS = (
+    ('wsgi', 'wsgi', '/ads/', '/ads/detail/{ad_id}/'),
+    ('asgi_sync', 'asgi', '/ads/', '/ads/detail/{ad_id}/'),
+    ('asgi_async', 'asgi', '/ads/async/', '/ads/async/detail/{ad_id}/'),
+)
+
+
+def make_chooser(list_path, detail_path, headers):
+    counter = 0
+
+    def choose_request():
+        nonlocal counter
+        counter += 1
+        if counter % 2:
+            return 'list', 'GET', list_path, {}, b''
+        return 'detail', 'GET', detail_path, headers, b''
+
+    return choose_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wsgi', required=True, help='Адрес сервера под WSGI')
+    parser.add_argument('--asgi', required=True, help='Адрес сервера под ASGI')
+    parser.add_argument('--token', required=True, help='JWT access-токен для просмотра объявления')
+    parser.add_argument('--ad-id', type=int, required=True, help='Id объявления для просмотра')
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--output', help='Файл для JSON-отчета')
+    args = parser.parse_args()
+
+    headers = {'Authorization': f'Bearer {args.token}'}
+    report = {}
+    for name, server, list_path, detail_path in SCENARIOS:
+        base_url = args.wsgi if server == 'wsgi' else args.asgi
+        chooser = make_chooser(list_path, detail_path.format(ad_id=args.ad_id), headers)
+        report[name] = asyncio.run(run_load(base_url, chooser, args.concurrency, args.duration))
+        print(f"{name:<12} {report[name]['rps']:>10} rps  p99 {report[name]['p99_ms']} ms  "
+              f"errors {report[name]['errors']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
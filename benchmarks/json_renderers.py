@@ -0,0 +1,90 @@
+"""
+Бенчмарк JSON: JSONRenderer/JSONParser DRF на стандартном json против ORJSONRenderer/ORJSONParser.
+
+БД не нужна: страница ленты и строки выгрузки строятся в памяти в том виде, в каком их отдают
+план полей списка и NDJSON-выгрузка. Измеряется рендеринг страницы ленты, кодирование выгрузки
+построчно и разбор тела пакетного создания объявлений.
+
+    python benchmarks/json_renderers.py --page-size 1000 --export-rows 100000 --repeat 5
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from rest_framework.parsers import JSONParser  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+from serializer_fast_path import make_rows  # noqa: E402
+
+from callboard.export import encode_value  # noqa: E402
+from callboard.models import Ad  # noqa: E402
+from callboard.projections import get_field_plan  # noqa: E402
+from callboard.serializers import AdListSerializer  # noqa: E402
+from config.parsers import ORJSONParser  # noqa: E402
+from config.renderers import ORJSONRenderer, dumps, orjson  # noqa: E402
+
+
+def measure(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def stdlib_dumps(row):
+    return json.dumps(row, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-size', type=int, default=1000, help='Объявлений на странице ленты')
+    parser.add_argument('--export-rows', type=int, default=100000, help='Строк выгрузки')
+    parser.add_argument('--repeat', type=int, default=5, help='Число повторов, берется лучший')
+    args = parser.parse_args()
+    if orjson is None:
+        print('orjson не установлен, ORJSONRenderer работает через стандартный json')
+
+    plan = get_field_plan(AdListSerializer)
+    fields = [field for field in Ad._meta.concrete_fields if field.attname in plan.columns]
+    columns = [field.attname for field in fields]
+    page = {'next': None, 'previous': None, 'results': plan.encode(
+        dict(zip(columns, row)) for row in make_rows(fields, args.page_size))}
+    export_fields = list(AdListSerializer().fields)
+    export_rows = [dict(zip(export_fields, map(encode_value, row)))
+                   for row in make_rows(fields, args.export_rows)]
+    body = JSONRenderer().render([{'title': row['title'], 'price': row['price'], 'description': row['description']}
+                                  for row in page['results']])
+
+    assert ORJSONRenderer().render(page) == JSONRenderer().render(page)
+    assert [dumps(row) for row in export_rows[:100]] == [stdlib_dumps(row) for row in export_rows[:100]]
+    assert ORJSONParser().parse(io.BytesIO(body)) == JSONParser().parse(io.BytesIO(body))
+
+    cases = (
+        (f'ad_list render, {args.page_size} rows',
+         lambda: JSONRenderer().render(page), lambda: ORJSONRenderer().render(page)),
+        (f'export ndjson, {args.export_rows} rows',
+         lambda: [stdlib_dumps(row) for row in export_rows], lambda: [dumps(row) for row in export_rows]),
+        (f'bulk body parse, {len(body)} bytes',
+         lambda: JSONParser().parse(io.BytesIO(body)), lambda: ORJSONParser().parse(io.BytesIO(body))),
+    )
+    print(f"{'case':<36} {'json ms':>10} {'orjson ms':>10} {'speedup':>8}")
+    for name, slow_func, fast_func in cases:
+        slow = measure(slow_func, args.repeat)
+        fast = measure(fast_func, args.repeat)
+        print(f'{name:<36} {slow * 1000:>10.2f} {fast * 1000:>10.2f} {slow / fast:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Нагрузочный тест API доски объявлений со смешанным профилем запросов.
+
+Скрипт заполняет базу, с которой работает сервер (те же настройки Django и .env), командой generate_data:
+пользователями, объявлениями и отзывами, затем воспроизводит взвешенную смесь запросов:
+лента, поиск, просмотр объявления, создание объявления и создание отзыва.
+Результат - JSON-отчет с пропускной способностью и p50/p95/p99 по каждому эндпоинту.
+
+Сервер запускается отдельно, например:
+    gunicorn config.wsgi -w 4 --threads 8 -b 127.0.0.1:8000
+
+    python benchmarks/load_test.py --base-url http://127.0.0.1:8000 --users 1000 --ads 20000 \\
+        --reviews 100000 --concurrency 100 --duration 60 --output report.json
+
+Прогоны воспроизводимы: данные и последовательность запросов определяются --seed.
+Чтобы сравнить два релиза, сохраните отчеты и передайте первый через --baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+import django
+from loadgen import run_load
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection, transaction  # noqa: E402
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+
+from callboard.generator import TITLE_ADJECTIVES, TITLE_WORDS  # noqa: E402
+from callboard.models import Ad, Review  # noqa: E402
+from users.models import User  # noqa: E402
+
+# Все данные нагрузочного теста принадлежат пользователям с этим доменом и удаляются перед заполнением
+EMAIL_DOMAIN = 'loadtest.local'
+
+DEFAULT_MIX = 'list=40,search=15,detail=30,create_ad=10,create_review=5'
+
+
+def make_title(rng):
+    return f'{rng.choice(TITLE_WORDS).capitalize()} {rng.choice(TITLE_ADJECTIVES)}'
+
+
+def seed_data(seed, users, ads, reviews):
+    """Пересоздает данные нагрузочного теста командой generate_data"""
+    with transaction.atomic():
+        User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').delete()
+    call_command('generate_data', users=users, ads=ads, reviews=reviews, seed=seed, email_domain=EMAIL_DOMAIN)
+
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for model in (User, Ad, Review):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+
+def load_dataset():
+    """Id пользователей и объявлений нагрузочного теста и количество отзывов к ним"""
+    user_ids = list(User.objects.filter(email__endswith=f'@{EMAIL_DOMAIN}').values_list('pk', flat=True))
+    ad_ids = list(Ad.objects.filter(author_id__in=user_ids).values_list('pk', flat=True))
+    return user_ids, ad_ids, Review.objects.filter(author_id__in=user_ids).count()
+
+
+def issue_tokens(user_ids, count):
+    """Выпускает access-токены для части пользователей, запросы распределяются между ними"""
+    users = User.objects.filter(pk__in=user_ids[:count])
+    return [str(RefreshToken.for_user(user).access_token) for user in users]
+
+
+def parse_mix(value):
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in REQUESTS:
+            raise argparse.ArgumentTypeError(f'Неизвестный тип запроса: {name}')
+        mix[name] = float(weight)
+    return mix
+
+
+def json_request(name, method, path, token, payload=None):
+    headers = {'Authorization': f'Bearer {token}'}
+    body = b''
+    if payload is not None:
+        headers['Content-Type'] = 'application/json'
+        body = json.dumps(payload).encode()
+    return name, method, path, headers, body
+
+
+REQUESTS = {
+    'list': lambda rng, token, ad_ids: json_request('list', 'GET', '/ads/', token),
+    'search': lambda rng, token, ad_ids: json_request(
+        'search', 'GET', f'/ads/?search={rng.choice(TITLE_WORDS)}', token),
+    'detail': lambda rng, token, ad_ids: json_request(
+        'detail', 'GET', f'/ads/detail/{rng.choice(ad_ids)}/', token),
+    'create_ad': lambda rng, token, ad_ids: json_request(
+        'create_ad', 'POST', '/ads/create/', token,
+        {'title': make_title(rng), 'price': rng.randint(100, 100_000), 'description': 'Описание'}),
+    'create_review': lambda rng, token, ad_ids: json_request(
+        'create_review', 'POST', '/ads/review/', token, {'ad': rng.choice(ad_ids), 'text': 'Отзыв'}),
+}
+
+
+def make_chooser(rng, mix, tokens, ad_ids):
+    """Выбирает очередной запрос из смеси с заданными весами; кириллица в поиске кодируется в URL"""
+    names = list(mix)
+    weights = [mix[name] for name in names]
+
+    def choose_request():
+        name, method, path, headers, body = REQUESTS[rng.choices(names, weights)[0]](
+            rng, rng.choice(tokens), ad_ids)
+        return name, method, quote(path, safe='/?=&'), headers, body
+
+    return choose_request
+
+
+def get_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report, baseline=None):
+    rows = [('total', report['results'])] + list(report['results']['endpoints'].items())
+    base = {}
+    if baseline:
+        base = {'total': baseline['results'], **baseline['results']['endpoints']}
+    print(f"{'endpoint':<14} {'rps':>10} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>8}")
+    for name, stats in rows:
+        line = (f"{name:<14} {stats['rps']:>10} {stats['p50_ms']:>10} {stats['p95_ms']:>10} "
+                f"{stats['p99_ms']:>10} {stats['errors']:>8}")
+        previous = base.get(name)
+        if previous and previous['rps'] and previous['p99_ms'] and stats['p99_ms']:
+            line += (f"   rps {stats['rps'] / previous['rps'] - 1:+.1%}"
+                     f"  p99 {stats['p99_ms'] / previous['p99_ms'] - 1:+.1%}")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Адрес запущенного сервера')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--ads', type=int, default=20000)
+    parser.add_argument('--reviews', type=int, default=100000)
+    parser.add_argument('--skip-seed', action='store_true', help='Использовать данные предыдущего прогона')
+    parser.add_argument('--tokens', type=int, default=100, help='Сколько пользователей отправляют запросы')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help=f'Веса типов запросов, по умолчанию {DEFAULT_MIX}')
+    parser.add_argument('--seed', type=int, default=42, help='Зерно генератора данных и последовательности запросов')
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--warmup', type=float, default=5)
+    parser.add_argument('--output', help='Файл для JSON-отчета')
+    parser.add_argument('--baseline', help='JSON-отчет предыдущего прогона для сравнения')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if not args.skip_seed:
+        seed_data(args.seed, args.users, args.ads, args.reviews)
+    user_ids, ad_ids, review_count = load_dataset()
+    if not user_ids or not ad_ids:
+        parser.error('Нет данных нагрузочного теста, запустите без --skip-seed')
+    tokens = issue_tokens(user_ids, args.tokens)
+
+    results = asyncio.run(run_load(args.base_url, make_chooser(rng, args.mix, tokens, ad_ids), args.concurrency,
+                                   args.duration, args.warmup))
+    report = {
+        'meta': {
+            'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'revision': get_revision(),
+            'python': platform.python_version(),
+            'base_url': args.base_url,
+            'dataset': {'users': len(user_ids), 'ads': len(ad_ids), 'reviews': review_count,
+                        'seeded': not args.skip_seed},
+            'mix': args.mix,
+            'seed': args.seed,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+        },
+        'results': results,
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Генератор HTTP-нагрузки на asyncio без сторонних зависимостей.
+Каждый из N воркеров держит свое keep-alive соединение и отправляет запросы подряд,
+задержки собираются для расчета перцентилей.
+"""
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+
+class Connection:
+    """Минимальный клиент HTTP/1.1 поверх одного keep-alive соединения"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=b''):
+        """Отправляет запрос и возвращает (статус, тело ответа)"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b'\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while size := int((await self.reader.readline()).strip(), 16):
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            await self.reader.readline()
+            content = b''.join(chunks)
+        else:
+            content = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+
+        if response_headers.get('connection') == 'close':
+            await self.close()
+        return status, content
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def percentile(sorted_values, percent):
+    """Перцентиль по методу ближайшего ранга"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, statuses, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'statuses': dict(statuses),
+        'rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+async def run_load(base_url, choose_request, concurrency=50, duration=10.0, warmup=1.0):
+    """
+    Нагружает сервер в течение duration секунд.
+    choose_request() возвращает (имя, метод, путь, заголовки, тело) очередного запроса,
+    запросы первых warmup секунд в статистику не попадают.
+    Возвращает общую сводку и сводки по именам запросов
+    """
+    url = urlsplit(base_url)
+    started = time.perf_counter()
+    measure_from = started + warmup
+    deadline = measure_from + duration
+    results = {}
+
+    async def worker():
+        connection = Connection(url.hostname, url.port or 80)
+        while (now := time.perf_counter()) < deadline:
+            name, method, path, headers, body = choose_request()
+            stats = results.setdefault(name, {'latencies': [], 'statuses': Counter(), 'errors': 0})
+            try:
+                status, _ = await connection.request(method, url.path.rstrip('/') + path, headers, body)
+            except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+                await connection.close()
+                if now >= measure_from:
+                    stats['errors'] += 1
+                continue
+            if now >= measure_from:
+                stats['latencies'].append(time.perf_counter() - now)
+                stats['statuses'][status] += 1
+        await connection.close()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+
+    total = summarize(
+        [latency for stats in results.values() for latency in stats['latencies']],
+        sum((stats['statuses'] for stats in results.values()), Counter()),
+        sum(stats['errors'] for stats in results.values()),
+        elapsed,
+    )
+    total['endpoints'] = {
+        name: summarize(stats['latencies'], stats['statuses'], stats['errors'], elapsed)
+        for name, stats in sorted(results.items())
+    }
+    return total
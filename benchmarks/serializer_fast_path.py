@@ -0,0 +1,95 @@
+"""
+Микробенчмарк кодирования страницы списка: сериализатор DRF на моделях против плана полей на строках values().
+
+БД не нужна: строки генерируются в памяти с теми же значениями, что вернул бы драйвер,
+поэтому сравнивается только работа процессора на строку. Путь сериализатора включает
+создание моделей (Model.from_db, как при обходе queryset), путь плана - построение словарей values().
+
+    python benchmarks/serializer_fast_path.py --page-sizes 100 500 1000 --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import django
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+django.setup()
+
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from callboard import serializers  # noqa: E402
+from callboard.models import Ad, Review  # noqa: E402
+from callboard.projections import get_field_plan  # noqa: E402
+
+CASES = (
+    ('ad_list', Ad, serializers.AdListSerializer),
+    ('review_list', Review, serializers.ReviewSerializers),
+)
+
+
+def make_value(field, index):
+    """Значение колонки того же типа, что приходит из БД"""
+    started = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    internal_type = field.get_internal_type()
+    if field.null and index % 3 == 0:
+        return None
+    if internal_type == 'DateTimeField':
+        return started + timedelta(seconds=index * 37, microseconds=index)
+    if internal_type in ('CharField', 'TextField'):
+        return f'{field.name} {index} ' * 5
+    return index
+
+
+def make_rows(fields, size):
+    return [tuple(make_value(field, index) for field in fields) for index in range(1, size + 1)]
+
+
+def serialize_models(model, serializer_class, columns, rows):
+    instances = [model.from_db('default', columns, row) for row in rows]
+    return serializer_class(instances, many=True).data
+
+
+def encode_plan(plan, columns, rows):
+    return plan.encode(dict(zip(columns, row)) for row in rows)
+
+
+def measure(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.process_time()
+        func()
+        best = min(best, time.process_time() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=20, help='Число повторов, берется лучший')
+    args = parser.parse_args()
+
+    print(f"{'case':<12} {'rows':>6} {'serializer us/row':>18} {'plan us/row':>12} {'speedup':>8}")
+    for name, model, serializer_class in CASES:
+        plan = get_field_plan(serializer_class)
+        # Колонки в порядке полей модели, как их передает в from_db queryset
+        fields = [field for field in model._meta.concrete_fields if field.attname in plan.columns]
+        columns = [field.attname for field in fields]
+        for size in args.page_sizes:
+            rows = make_rows(fields, size)
+            renderer = JSONRenderer()
+            assert (renderer.render(serialize_models(model, serializer_class, columns, rows))
+                    == renderer.render(encode_plan(plan, columns, rows))), f'{name}: выдача не совпадает'
+            slow = measure(lambda: serialize_models(model, serializer_class, columns, rows), args.repeat)
+            fast = measure(lambda: encode_plan(plan, columns, rows), args.repeat)
+            print(f'{name:<12} {size:>6} {slow / size * 1e6:>18.2f} {fast / size * 1e6:>12.2f} '
+                  f'{slow / fast:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
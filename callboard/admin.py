@@ -5,7 +5,7 @@ from callboard.models import Ad, Review
 
 @admin.register(Ad)
 class AdAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'title', 'price', 'author', 'created_at',)
+    list_display = ('pk', 'title', 'price', 'author', 'review_count', 'created_at',)
     list_filter = ('author',)
     search_fields = ('title',)
 
@@ -0,0 +1,129 @@
+import csv
+import io
+import json
+import re
+from itertools import islice
+
+from django.db import connection
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+from django.db.models import DateTimeField
+from django.utils import timezone
+
+from users.models import User
+
+
+def read_records(file, file_format):
+    """Построчно читает записи из CSV или JSONL файла, не загружая файл в память целиком"""
+    if file_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def batched(iterable, size):
+    """Разбивает поток на пакеты заданного размера"""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def resolve_authors(emails, known):
+    """Дополняет словарь email -> id пользователя одним запросом по еще неизвестным адресам"""
+    missing = set(emails) - known.keys()
+    if missing:
+        known.update(User.objects.filter(email__in=missing).values_list('email', 'pk'))
+    return known
+
+
+def clean_value(field, value):
+    """Приводит значение из файла к типу поля модели с проверкой ограничений поля"""
+    if field.is_relation:
+        # Существование связанного объекта проверяет внешний ключ в БД, а не запрос на каждую строку
+        field = field.target_field
+    value = field.clean(value, None)
+    if isinstance(field, DateTimeField) and timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def can_copy():
+    return connection.vendor == 'postgresql' and not is_psycopg3
+
+
+def get_copy_sql(model, fields, options=''):
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(model._meta.get_field(name).column) for name in fields)
+    return f'COPY {quote_name(model._meta.db_table)} ({columns}) FROM STDIN {options}'.rstrip()
+
+
+def copy_rows(model, fields, rows):
+    """Загружает пакет строк в таблицу модели через COPY"""
+    buffer = io.StringIO()
+    # Все значения в кавычках, чтобы пустая строка не превратилась в NULL
+    csv.writer(buffer, quoting=csv.QUOTE_ALL).writerows(rows)
+    buffer.seek(0)
+    options = 'FORMAT csv'
+    # Пустое значение в колонках, допускающих NULL, загружается как NULL
+    nullable = ', '.join(connection.ops.quote_name(field.column)
+                         for field in map(model._meta.get_field, fields) if field.null)
+    if nullable:
+        options += f', FORCE_NULL ({nullable})'
+    with connection.cursor() as cursor:
+        cursor.copy_expert(get_copy_sql(model, fields, f'WITH ({options})'), buffer)
+
+
+# Спецсимволы текстового формата COPY и их экранирование
+COPY_ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+COPY_UNESCAPES = {escaped[1]: char for char, escaped in COPY_ESCAPES.items()}
+COPY_NULL = '\\N'
+
+
+def escape_copy_value(value):
+    """Экранирует строку для текстового формата COPY"""
+    return value.translate(str.maketrans(COPY_ESCAPES))
+
+
+def decode_copy_line(line):
+    """Значения строки текстового формата COPY: NULL как None, остальные - строки без экранирования"""
+    def unescape(match):
+        # Как и в PostgreSQL, обратная косая черта перед другим символом означает сам этот символ
+        return COPY_UNESCAPES.get(match[1], match[1])
+
+    return [None if value == COPY_NULL else re.sub(r'\\(.)', unescape, value)
+            for value in line.rstrip('\n').split('\t')]
+
+
+def insert_copy_text(model, fields, lines):
+    """
+    Загружает пакет строк, уже закодированных в текстовом формате COPY: значения через табуляцию,
+    NULL как \\N, каждая строка заканчивается переводом строки. Кодирование строк на стороне
+    вызывающего кода быстрее, чем запись кортежей через csv. Без COPY строки разбираются обратно
+    и загружаются пакетным INSERT
+    """
+    if not can_copy():
+        insert_rows(model, fields, [decode_copy_line(line) for line in lines])
+        return
+    with connection.cursor() as cursor:
+        cursor.copy_expert(get_copy_sql(model, fields), io.StringIO(''.join(lines)))
+
+
+def insert_rows(model, fields, rows):
+    """
+    Загружает пакет строк в таблицу модели.
+    На PostgreSQL используется COPY, на остальных бэкендах - пакетный INSERT
+    """
+    if can_copy():
+        copy_rows(model, fields, rows)
+        return
+    model_fields = [model._meta.get_field(name) for name in fields]
+    # Не bulk_create: он перезаписывает created_at/updated_at текущим временем через auto_now
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(field.column) for field in model_fields)
+    placeholders = ', '.join(['%s'] * len(model_fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {quote_name(model._meta.db_table)} ({columns}) VALUES ({placeholders})',
+            [[field.get_db_prep_save(value, connection) for field, value in zip(model_fields, row)] for row in rows],
+        )
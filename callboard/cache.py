@@ -0,0 +1,40 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+AD_LIST_GENERATION_KEY = 'ads:list:generation'
+
+
+def get_ad_list_generation():
+    """Возвращает текущее поколение кэша списка объявлений"""
+    generation = cache.get(AD_LIST_GENERATION_KEY)
+    if generation is None:
+        # Новое поколение берется из времени, чтобы после вытеснения ключа не совпасть со старыми страницами
+        cache.add(AD_LIST_GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(AD_LIST_GENERATION_KEY)
+    return generation
+
+
+def bump_ad_list_generation():
+    """Делает недействительными все закэшированные страницы списка объявлений"""
+    try:
+        cache.incr(AD_LIST_GENERATION_KEY)
+    except ValueError:
+        cache.add(AD_LIST_GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_ad_list():
+    """Сбрасывает кэш списка объявлений после фиксации текущей транзакции"""
+    transaction.on_commit(bump_ad_list_generation)
+
+
+def get_ad_list_cache_key(request):
+    """
+    Ключ страницы списка объявлений для текущего поколения кэша.
+    Вычисляется до запроса к БД, чтобы страница, прочитанная до записи, не попала в новое поколение
+    """
+    query = sorted((key, value) for key, values in request.query_params.lists() for value in values)
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+    return f'ads:list:{get_ad_list_generation()}:{hashlib.md5(url.encode()).hexdigest()}'
@@ -0,0 +1,40 @@
+import csv
+from datetime import datetime
+
+from callboard.bulk import batched
+from callboard.projections import encode_datetime
+from config.renderers import dumps
+
+
+def encode_value(value):
+    """Приводит значение к виду, в котором его отдает сериализатор DRF"""
+    if isinstance(value, datetime):
+        return encode_datetime(value)
+    return value
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает записанную строку вместо сохранения"""
+
+    def write(self, value):
+        return value
+
+
+def encode_ndjson(fields, rows, chunk_size):
+    """Кодирует строки в NDJSON, отдавая их пачками"""
+    for batch in batched(rows, chunk_size):
+        yield b''.join(dumps(dict(zip(fields, map(encode_value, row)))) + b'\n' for row in batch)
+
+
+def encode_csv(fields, rows, chunk_size):
+    """Кодирует строки в CSV с заголовком, отдавая их пачками"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for batch in batched(rows, chunk_size):
+        yield ''.join(writer.writerow(map(encode_value, row)) for row in batch)
+
+
+EXPORT_FORMATS = {
+    'ndjson': (encode_ndjson, 'application/x-ndjson'),
+    'csv': (encode_csv, 'text/csv; charset=utf-8'),
+}
@@ -0,0 +1,33 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db.models import F
+from rest_framework.filters import SearchFilter
+
+from callboard.models import SEARCH_CONFIG
+
+
+class AdSearchFilter(SearchFilter):
+    """
+    Поиск объявлений с сортировкой результатов по релевантности.
+    По умолчанию полнотекстовый по названию и описанию (хранимый search_vector с GIN-индексом),
+    с ?search_mode=trigram - нечеткий по названию, устойчивый к опечаткам (pg_trgm)
+    """
+    search_mode_param = 'search_mode'
+
+    def get_search_term(self, request):
+        return request.query_params.get(self.search_param, '').replace('\x00', '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        search_term = self.get_search_term(request)
+        if not search_term:
+            return queryset
+        if request.query_params.get(self.search_mode_param) == 'trigram':
+            queryset = queryset.filter(title__trigram_similar=search_term).annotate(
+                rank=TrigramSimilarity('title', search_term)
+            )
+        else:
+            query = SearchQuery(search_term, search_type='websearch', config=SEARCH_CONFIG)
+            queryset = queryset.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            )
+        return queryset.order_by('-rank', '-created_at', '-id')
@@ -0,0 +1,119 @@
+import random
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+
+from callboard.bulk import COPY_NULL, escape_copy_value
+from users.models import User
+
+TITLE_WORDS = ('велосипед', 'диван', 'телефон', 'ноутбук', 'куртка', 'коляска', 'холодильник', 'гитара',
+               'шкаф', 'палатка', 'самокат', 'монитор', 'кресло', 'фотоаппарат', 'пылесос', 'стол')
+TITLE_ADJECTIVES = ('новый', 'б/у', 'детский', 'горный', 'складной', 'кожаный', 'игровой', 'большой',
+                    'компактный', 'винтажный')
+DESCRIPTION_PHRASES = ('В отличном состоянии.', 'Торг уместен.', 'Самовывоз из центра.', 'Есть доставка.',
+                       'Полный комплект, все документы.', 'Продаю в связи с переездом.',
+                       'Есть небольшие следы использования.', 'Звоните в любое время.')
+REVIEW_PHRASES = ('Отличный продавец, все как в описании.', 'Быстро ответили, договорились о встрече.',
+                  'Товар уже продан?', 'Цена завышена.', 'Спасибо, все понравилось!',
+                  'Можно больше фотографий?', 'Не отвечает на сообщения.', 'Рекомендую.')
+FIRST_NAMES = ('Александр', 'Мария', 'Дмитрий', 'Анна', 'Сергей', 'Елена', 'Иван', 'Ольга', 'Максим', 'Наталья')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов',
+              'Новиков', 'Федоров')
+
+USER_FIELDS = ('id', 'password', 'is_superuser', 'is_staff', 'is_active', 'date_joined', 'first_name',
+               'last_name', 'phone', 'email', 'role', 'image')
+AD_FIELDS = ('id', 'title', 'price', 'description', 'author', 'created_at', 'updated_at', 'review_count',
+             'last_review_at')
+REVIEW_FIELDS = ('text', 'ad', 'author', 'created_at', 'updated_at')
+
+# Степени перекоса: чем больше, тем сильнее объявления и отзывы сосредоточены у небольшой доли.
+# Элемент выбирается как first + int(count * random() ** skew), первые элементы выбираются намного чаще
+AUTHOR_SKEW = 2
+REVIEW_SKEW = 3
+
+
+# Время суток для каждой секунды суток: форматирование времени сводится к подстановке строк
+CLOCK = tuple(f'{hour:02d}:{minute:02d}:{second:02d}'
+              for hour in range(24) for minute in range(60) for second in range(60))
+
+
+def pick(random, items):
+    """Быстрая замена random.choice для горячих циклов"""
+    return items[int(random() * len(items))]
+
+
+class DataGenerator:
+    """
+    Генератор строк синтетических пользователей, объявлений и отзывов в текстовом формате COPY.
+    Активность авторов и число отзывов распределены с перекосом, цены - логнормально,
+    свежих объявлений больше, чем старых, а отзывы появляются вскоре после публикации.
+    Тексты берутся из констант модуля без спецсимволов COPY, поэтому строки собираются без экранирования
+    """
+
+    def __init__(self, seed=None, days=365, email_domain='generated.local'):
+        self.random = random.Random(seed)
+        self.period = timedelta(days=days).total_seconds()
+        self.email_domain = escape_copy_value(email_domain)
+        self.now = timezone.now().timestamp()
+        self.dates = {}
+
+    def format_timestamp(self, timestamp):
+        """
+        Время UTC с точностью до секунды в виде, который принимает COPY.
+        Втрое быстрее str(datetime): дата берется из кэша по дням, время суток - из CLOCK
+        """
+        day, second = divmod(int(timestamp), 86400)
+        date = self.dates.get(day)
+        if date is None:
+            date = self.dates[day] = datetime.fromtimestamp(day * 86400, dt_timezone.utc).strftime('%Y-%m-%d')
+        return f'{date} {CLOCK[second]}+00'
+
+    def users(self, first_id, count, password):
+        """Строки пользователей в порядке USER_FIELDS, у всех один готовый хеш пароля"""
+        random = self.random.random
+        password = escape_copy_value(password)
+        image = escape_copy_value(User._meta.get_field('image').default)
+        role = User.UsersRolesChoices.USER.value
+        for user_id in range(first_id, first_id + count):
+            date_joined = self.format_timestamp(self.now - self.period * random())
+            yield (f'{user_id}\t{password}\tf\tf\tt\t{date_joined}\t{pick(random, FIRST_NAMES)}\t'
+                   f'{pick(random, LAST_NAMES)}\t+79{int(random() * 1_000_000_000):09d}\t'
+                   f'user{user_id}@{self.email_domain}\t{role}\t{image}\n')
+
+    def review_counts(self, ads, reviews):
+        """Распределяет отзывы по объявлениям: большинство отзывов у немногих популярных объявлений"""
+        random = self.random.random
+        counts = [0] * ads
+        for _ in range(reviews if ads else 0):
+            counts[int(ads * random() ** REVIEW_SKEW)] += 1
+        return counts
+
+    def ads(self, first_id, counts, first_user_id, users):
+        """
+        Пары (строка объявления в порядке AD_FIELDS, строки его отзывов в порядке REVIEW_FIELDS).
+        Счетчики отзывов объявления заполняются сразу и совпадают с его отзывами.
+        Время создания и изменения совпадает, поэтому форматируется один раз на строку
+        """
+        random = self.random.random
+        lognormvariate = self.random.lognormvariate
+        format_timestamp = self.format_timestamp
+        for ad_id, review_count in enumerate(counts, start=first_id):
+            title = f'{pick(random, TITLE_WORDS).capitalize()} {pick(random, TITLE_ADJECTIVES)}'
+            price = max(100, int(round(lognormvariate(8.5, 1.2), -2)))
+            created_at = self.now - self.period * random() ** 2
+            lifetime = self.now - created_at
+            review_times = [created_at + lifetime * random() ** 3 for _ in range(review_count)]
+            review_times.sort()
+            reviews = []
+            last_review_at = COPY_NULL
+            for review_time in review_times:
+                last_review_at = format_timestamp(review_time)
+                reviews.append(f'{pick(random, REVIEW_PHRASES)}\t{ad_id}\t'
+                               f'{first_user_id + int(users * random() ** AUTHOR_SKEW)}\t'
+                               f'{last_review_at}\t{last_review_at}\n')
+            created_at = format_timestamp(created_at)
+            ad = (f'{ad_id}\t{title}\t{price}\t{title}. {pick(random, DESCRIPTION_PHRASES)}\t'
+                  f'{first_user_id + int(users * random() ** AUTHOR_SKEW)}\t{created_at}\t{created_at}\t'
+                  f'{review_count}\t{last_review_at}\n')
+            yield ad, reviews
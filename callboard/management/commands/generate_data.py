@@ -0,0 +1,116 @@
+import time
+from contextlib import contextmanager, nullcontext
+from copy import copy
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from callboard.bulk import batched, insert_copy_text
+from callboard.cache import invalidate_ad_list
+from callboard.generator import (AD_FIELDS, REVIEW_FIELDS, USER_FIELDS,
+                                 DataGenerator)
+from callboard.models import Ad, Review
+from users.models import User
+
+
+def get_next_id(model):
+    return (model.objects.aggregate(last_id=Max('pk'))['last_id'] or 0) + 1
+
+
+@contextmanager
+def deferred_indexes(models):
+    """
+    Снимает индексы из Meta.indexes и ограничения внешних ключей моделей на время загрузки
+    и создает их заново. Построить индекс и проверить ключи одним проходом по готовой таблице
+    быстрее, чем обновлять индексы и запускать триггер проверки на каждую строку
+    """
+    foreign_keys = [
+        (model, field, copy_field(field, db_constraint=False))
+        for model in models
+        for field in model._meta.local_fields
+        if field.is_relation and field.db_constraint
+    ]
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+        for model, field, loose_field in foreign_keys:
+            editor.alter_field(model, field, loose_field)
+    yield
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.add_index(model, index)
+        for model, field, loose_field in foreign_keys:
+            editor.alter_field(model, loose_field, field)
+
+
+def copy_field(field, **changes):
+    """Копия поля модели с измененными параметрами для alter_field"""
+    clone = copy(field)
+    clone.__dict__.update(changes)
+    return clone
+
+
+class Command(BaseCommand):
+    """
+    Генерация синтетических пользователей, объявлений и отзывов для нагрузочных тестов.
+    Хеш пароля считается один раз на всех пользователей, строки генерируются сразу в текстовом формате COPY
+    и загружаются пакетами.
+    Id назначаются командой, поэтому во время генерации в базу не должны писать другие процессы
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Количество пользователей')
+        parser.add_argument('--ads', type=int, default=10000, help='Количество объявлений')
+        parser.add_argument('--reviews', type=int, default=50000, help='Количество отзывов')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Количество строк в одном пакете')
+        parser.add_argument('--days', type=int, default=365, help='За сколько дней распределяются даты')
+        parser.add_argument('--password', default='password', help='Пароль всех пользователей')
+        parser.add_argument('--email-domain', default='generated.local', help='Домен почты пользователей')
+        parser.add_argument('--seed', type=int, help='Зерно генератора для воспроизводимых данных')
+        parser.add_argument('--keep-indexes', action='store_true',
+                            help='Не снимать индексы и внешние ключи объявлений и отзывов на время загрузки, '
+                                 'даже если объявлений создается больше, чем уже есть')
+
+    def handle(self, *args, **options):
+        if options['ads'] and not options['users']:
+            raise CommandError('Для объявлений нужен хотя бы один пользователь.')
+        generator = DataGenerator(options['seed'], options['days'], options['email_domain'])
+        batch_size = options['batch_size']
+
+        started = time.monotonic()
+        with transaction.atomic():
+            first_user_id = get_next_id(User)
+            for batch in batched(generator.users(first_user_id, options['users'], make_password(options['password'])),
+                                 batch_size):
+                insert_copy_text(User, USER_FIELDS, batch)
+
+            counts = generator.review_counts(options['ads'], options['reviews'])
+            ads = generator.ads(get_next_id(Ad), counts, first_user_id, options['users'])
+            # Перестройка проходит по всей таблице, поэтому окупается, только если новых строк не меньше старых
+            rebuild = not options['keep_indexes'] and options['ads'] >= Ad.objects.count()
+            with deferred_indexes([Ad, Review]) if rebuild else nullcontext():
+                for number, batch in enumerate(batched(ads, batch_size), start=1):
+                    insert_copy_text(Ad, AD_FIELDS, [ad for ad, _ in batch])
+                    for reviews in batched((review for _, reviews in batch for review in reviews), batch_size):
+                        insert_copy_text(Review, REVIEW_FIELDS, reviews)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Загружено {min(number * batch_size, options["ads"])} объявлений...')
+
+            # Id пользователей и объявлений заданы явно, последовательности сдвигаются за них
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [User, Ad]):
+                    cursor.execute(sql)
+            invalidate_ad_list()
+
+        elapsed = time.monotonic() - started
+        total = options['users'] + options['ads'] + options['reviews']
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {options["users"]} пользователей, {options["ads"]} объявлений и {options["reviews"]} отзывов '
+            f'за {elapsed:.2f} с ({rate:.0f} строк/с).'
+        ))
@@ -0,0 +1,96 @@
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand, CommandError
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from callboard.bulk import (batched, clean_value, insert_rows, read_records,
+                            resolve_authors)
+from callboard.cache import invalidate_ad_list
+from callboard.models import Ad, Review
+from callboard.services import rebuild_review_counters
+
+# Поля из файла, которые загружаются в модель; автор задается колонкой author_email
+IMPORT_FIELDS = {
+    'ad': (Ad, ('title', 'price', 'description')),
+    'review': (Review, ('text', 'ad')),
+}
+
+
+class Command(BaseCommand):
+    """
+    Потоковая загрузка объявлений или отзывов из CSV/JSONL файла.
+    Файл читается пакетами, авторы ищутся по author_email, строки загружаются через COPY.
+    Загрузка выполняется в одной транзакции: при ошибке в любой строке ничего не сохраняется
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=IMPORT_FIELDS, help='Что загружать: объявления или отзывы')
+        parser.add_argument('path', help='Путь к CSV или JSONL файлу')
+        parser.add_argument('--format', choices=('csv', 'jsonl'), help='Формат файла, по умолчанию по расширению')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Количество строк в одном пакете')
+
+    def handle(self, *args, **options):
+        model, fields = IMPORT_FIELDS[options['model']]
+        file_format = options['format'] or ('csv' if options['path'].endswith('.csv') else 'jsonl')
+        self.model = model
+        self.fields = fields
+        self.authors = {}
+        self.touched_ads = set()
+
+        started = time.monotonic()
+        total = 0
+        try:
+            with open(options['path'], encoding='utf-8', newline='') as file, transaction.atomic():
+                records = enumerate(read_records(file, file_format), start=1)
+                for batch in batched(records, options['batch_size']):
+                    insert_rows(model, self.get_columns(), self.build_rows(batch))
+                    total += len(batch)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Загружено {total} строк...')
+                # Внешние ключи проверяются сразу, а не при фиксации внешней транзакции
+                connection.check_constraints(table_names=[model._meta.db_table])
+                self.finish()
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Не удалось прочитать файл: {error}')
+        except IntegrityError as error:
+            raise CommandError(f'Данные не соответствуют базе: {error}')
+
+        elapsed = time.monotonic() - started
+        rate = total / elapsed if elapsed else total
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {total} строк за {elapsed:.2f} с ({rate:.0f} строк/с).'
+        ))
+
+    def get_columns(self):
+        columns = (*self.fields, 'author', 'created_at', 'updated_at')
+        return (*columns, 'review_count') if self.model is Ad else columns
+
+    def build_rows(self, batch):
+        resolve_authors((record.get('author_email') for _, record in batch), self.authors)
+        now = timezone.now()
+        rows = []
+        for line, record in batch:
+            try:
+                values = [clean_value(self.model._meta.get_field(name), record.get(name)) for name in self.fields]
+                created_at = record.get('created_at')
+                created_at = clean_value(self.model._meta.get_field('created_at'), created_at) if created_at else now
+            except ValidationError as error:
+                raise CommandError(f'Строка {line}: {"; ".join(error.messages)}')
+            author_id = self.authors.get(record.get('author_email'))
+            if author_id is None:
+                raise CommandError(f'Строка {line}: пользователь {record.get("author_email")} не найден.')
+            row = [*values, author_id, created_at, created_at]
+            if self.model is Ad:
+                row.append(0)
+            else:
+                self.touched_ads.add(values[self.fields.index('ad')])
+            rows.append(row)
+        return rows
+
+    def finish(self):
+        """Пересчитывает счетчики затронутых объявлений и сбрасывает кэш списка после фиксации"""
+        for ad_ids in batched(sorted(self.touched_ads), 1000):
+            rebuild_review_counters(ad_ids)
+        invalidate_ad_list()
@@ -0,0 +1,23 @@
+from django.core.management import BaseCommand
+
+from callboard.models import Ad
+from callboard.services import rebuild_review_counters
+
+
+class Command(BaseCommand):
+    """Пересчет счетчиков отзывов объявлений пакетами"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Количество объявлений в одном пакете')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_pk = 0
+        updated = 0
+        while True:
+            ad_ids = list(Ad.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ad_ids:
+                break
+            updated += rebuild_review_counters(ad_ids)
+            last_pk = ad_ids[-1]
+        self.stdout.write(f'Пересчитаны счетчики отзывов для {updated} объявлений.')
@@ -0,0 +1,35 @@
+import json
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+from config.slow_queries import aggregate, read_entries
+
+
+class Command(BaseCommand):
+    """
+    Отчет по журналу медленных SQL-запросов.
+    Запросы группируются по отпечатку нормализованного SQL и сортируются по суммарному времени
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=settings.SLOW_QUERY_LOG_DIR, help='Каталог журнала')
+        parser.add_argument('--limit', type=int, default=10, help='Сколько худших запросов показать')
+        parser.add_argument('--plans', action='store_true', help='Показать план самого медленного выполнения')
+
+    def handle(self, *args, **options):
+        report = aggregate(read_entries(options['dir']))[:options['limit']]
+        if not report:
+            self.stdout.write('Медленных запросов нет.')
+            return
+        for rank, item in enumerate(report, start=1):
+            views = ', '.join(f'{view or "-"} ({count})' for view, count in
+                              sorted(item['views'].items(), key=lambda view: view[1], reverse=True))
+            self.stdout.write(self.style.WARNING(
+                f'{rank}. {item["fingerprint"]}: всего {item["total_ms"]:.0f} мс, {item["count"]} раз, '
+                f'в среднем {item["total_ms"] / item["count"]:.0f} мс, максимум {item["max_ms"]:.0f} мс'
+            ))
+            self.stdout.write(f'   маршруты: {views}')
+            self.stdout.write(f'   {item["sql"]}')
+            if options['plans'] and item['plan'] is not None:
+                self.stdout.write(json.dumps(item['plan'], ensure_ascii=False, indent=2))
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:08
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+import django.db.models.functions.text
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callboard', '0003_ad_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='ad',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['title'], name='ad_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(django.db.models.functions.comparison.Collate(django.db.models.functions.text.Upper('title'), 'C'), include=('title',), name='ad_title_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:12
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_review_counters(apps, schema_editor):
+    Ad = apps.get_model('callboard', 'Ad')
+    Review = apps.get_model('callboard', 'Review')
+    reviews = Review.objects.filter(ad=OuterRef('pk')).order_by().values('ad')
+    Ad.objects.update(
+        review_count=Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0),
+        last_review_at=Subquery(reviews.annotate(last=Max('created_at')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callboard', '0004_ad_title_trigram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ad',
+            name='last_review_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата и время последнего отзыва'),
+        ),
+        migrations.AddField(
+            model_name='ad',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Количество отзывов'),
+        ),
+        migrations.RunPython(fill_review_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('callboard', '0006_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='ad_author_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(fields=['updated_at'], name='ad_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['ad', '-created_at', '-id'], name='review_ad_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['ad', 'updated_at'], name='review_ad_updated_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['author', '-created_at', '-id'], name='review_author_created_at_idx'),
+        ),
+        # Индексы внешних ключей покрываются составными индексами выше. Удаляем только индексы,
+        # чтобы не пересоздавать и не перепроверять сами ограничения внешних ключей
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='ad',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+                ),
+                migrations.AlterField(
+                    model_name='review',
+                    name='ad',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='callboard.ad', verbose_name='Объявление'),
+                ),
+                migrations.AlterField(
+                    model_name='review',
+                    name='author',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Автор'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX IF EXISTS "callboard_ad_author_id_50c818ee"',
+                    reverse_sql='CREATE INDEX "callboard_ad_author_id_50c818ee" ON "callboard_ad" ("author_id")',
+                ),
+                migrations.RunSQL(
+                    'DROP INDEX IF EXISTS "callboard_review_ad_id_e67e7e01"',
+                    reverse_sql='CREATE INDEX "callboard_review_ad_id_e67e7e01" ON "callboard_review" ("ad_id")',
+                ),
+                migrations.RunSQL(
+                    'DROP INDEX IF EXISTS "callboard_review_author_id_09844f1c"',
+                    reverse_sql='CREATE INDEX "callboard_review_author_id_09844f1c" ON "callboard_review" ("author_id")',
+                ),
+            ],
+        ),
+    ]
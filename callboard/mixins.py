@@ -0,0 +1,164 @@
+import hashlib
+from functools import lru_cache
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+
+from callboard.projections import get_field_plan
+
+
+class ConditionalGetMixin:
+    """
+    Миксин условного GET.
+    Валидаторы (ETag, Last-Modified) считаются дешевым запросом до сериализации,
+    и при совпадении с If-None-Match/If-Modified-Since отдается 304 без тела
+    """
+
+    def get_validators(self):
+        """Возвращает пару (etag, last_modified) или (None, None), если валидаторов нет"""
+        return None, None
+
+    def make_validators(self, last_modified, *parts):
+        accepted_renderer = getattr(self.request, 'accepted_renderer', None)
+        parts = (last_modified.isoformat() if last_modified else '', *parts, self.request.get_full_path(),
+                 accepted_renderer.format if accepted_renderer else '')
+        etag = quote_etag(hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest())
+        return etag, last_modified
+
+    def make_list_validators(self, last_modified, *parts):
+        """
+        Валидаторы списка: только ETag.
+        MAX(updated_at) не меняется при удалении, и по If-Modified-Since клиент получил бы 304 со старым списком
+        """
+        etag, _ = self.make_validators(last_modified, *parts)
+        return etag, None
+
+    def make_queryset_validators(self, queryset):
+        """Валидаторы набора объектов по MAX(updated_at) и количеству"""
+        aggregate = queryset.order_by().aggregate(last_modified=Max('updated_at'), total=Count('pk'))
+        return self.make_list_validators(aggregate['last_modified'], aggregate['total'])
+
+    def get_page_conditional_response(self, request, handler, *args, **kwargs):
+        """
+        Условный GET по уже выбранной странице: ETag считается по данным ответа.
+        Вместо агрегата по всему набору объектов выполняется только ограниченный размером страницы запрос,
+        удаления и изменения строк страницы меняют ETag, а при совпадении тело не передается
+        """
+        response = handler(request, *args, **kwargs)
+        if response.status_code != 200:
+            return response
+        etag, _ = self.make_list_validators(None, hashlib.md5(repr(response.data).encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag) or response
+        response.headers['ETag'] = etag
+        return response
+
+    def get_conditional_response(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        if etag is None and last_modified is None:
+            return handler(request, *args, **kwargs)
+
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        if etag:
+            response.headers['ETag'] = etag
+        if timestamp is not None:
+            response.headers['Last-Modified'] = http_date(timestamp)
+        return response
+
+
+@lru_cache(maxsize=None)
+def get_field_sources(serializer_class):
+    """Поля ответа сериализатора и их источники, составляется один раз на класс"""
+    return {name: field.source for name, field in serializer_class().fields.items() if not field.write_only}
+
+
+class SparseFieldsMixin:
+    """
+    Миксин выборочных полей ответа на чтение.
+    ?fields=id,title оставляет только перечисленные поля, ?omit=description убирает перечисленные.
+    Лишние поля убираются из сериализатора, а из БД через only() читаются только колонки оставшихся
+    """
+    fields_query_param = 'fields'
+    omit_query_param = 'omit'
+    # Колонки, которые нужны полю ответа помимо его источника, например {'review_next': ('review_count',)}
+    sparse_field_columns = {}
+
+    def get_sparse_fields(self):
+        """Кортеж имен полей ответа или None, если нужен полный ответ"""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self.parse_sparse_fields()
+        return self._sparse_fields
+
+    def parse_sparse_fields(self):
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None
+        available = get_field_sources(self.get_serializer_class())
+        selected = {}
+        for param in (self.fields_query_param, self.omit_query_param):
+            names = [name.strip() for name in self.request.query_params.get(param, '').split(',') if name.strip()]
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                raise ValidationError({param: [f'Неизвестные поля: {", ".join(unknown)}.']})
+            selected[param] = names
+        fields, omit = selected[self.fields_query_param], selected[self.omit_query_param]
+        if not fields and not omit:
+            return None
+        field_names = tuple(name for name in available if (not fields or name in fields) and name not in omit)
+        if not field_names:
+            # Пустой ответ не нужен никому, а detail прочитал бы из БД один первичный ключ
+            raise ValidationError({self.omit_query_param: ['Исключены все поля ответа.']})
+        return field_names
+
+    def get_sparse_columns(self, model):
+        """Поля модели для only(): источники выбранных полей, их доп. колонки и поля курсора пагинации"""
+        sources = get_field_sources(self.get_serializer_class())
+        model_fields = {field.name for field in model._meta.concrete_fields}
+        columns = set(getattr(self.paginator, 'position_fields', ()))
+        for name in self.get_sparse_fields():
+            columns.update(self.sparse_field_columns.get(name, ()))
+            if sources[name] in model_fields:
+                columns.add(sources[name])
+        return [field.name for field in model._meta.concrete_fields if field.name in columns]
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.get_sparse_fields() is None:
+            return queryset
+        return queryset.only(*self.get_sparse_columns(queryset.model))
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        field_names = self.get_sparse_fields()
+        if field_names is not None:
+            fields = (serializer.child if isinstance(serializer, ListSerializer) else serializer).fields
+            for name in list(fields):
+                if name not in field_names:
+                    fields.pop(name)
+        return serializer
+
+
+class ProjectionListMixin(SparseFieldsMixin):
+    """
+    Миксин быстрого списка только для чтения с выборочными полями ответа.
+    Строки читаются через values() только нужными ответу колонками и кодируются
+    заранее составленным планом полей, ответ совпадает с ответом сериализатора
+    """
+
+    def list(self, request, *args, **kwargs):
+        plan = get_field_plan(self.get_serializer_class(), self.get_sparse_fields())
+        # Колонки курсора нужны пагинатору, даже если их нет в ответе
+        position_fields = [name for name in getattr(self.paginator, 'position_fields', ()) if name not in plan.columns]
+        queryset = self.filter_queryset(self.get_queryset()).values(*plan.columns, *position_fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(plan.encode(page))
+        return Response(plan.encode(queryset))
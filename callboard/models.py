@@ -1,15 +1,31 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Collate, Upper
 
 from config import settings
 
+SEARCH_CONFIG = 'russian'
+
 
 class Ad(models.Model):
     """Модель объявления"""
     title = models.CharField(max_length=150, verbose_name='Название')
     price = models.IntegerField(verbose_name='Цена')
     description = models.CharField(max_length=1000, verbose_name='Описание')
-    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='Автор')
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False,
+                               verbose_name='Автор')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата и время создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата и время изменения')
+    review_count = models.PositiveIntegerField(default=0, verbose_name='Количество отзывов')
+    last_review_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата и время последнего отзыва')
+    search_vector = models.GeneratedField(
+        expression=(SearchVector('title', weight='A', config=SEARCH_CONFIG)
+                    + SearchVector('description', weight='B', config=SEARCH_CONFIG)),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        verbose_name='Поисковый вектор',
+    )
 
     def __str__(self):
         return self.title
@@ -18,14 +34,25 @@ class Ad(models.Model):
         verbose_name = 'Объявление'
         verbose_name_plural = 'Объявления'
         ordering = ('-created_at',)
+        # Составные индексы с автором/объявлением в начале заменяют отдельные индексы внешних ключей
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='ad_created_at_id_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='ad_author_created_at_idx'),
+            models.Index(fields=['updated_at'], name='ad_updated_at_idx'),
+            GinIndex(fields=['search_vector'], name='ad_search_vector_idx'),
+            GinIndex(fields=['title'], opclasses=['gin_trgm_ops'], name='ad_title_trgm_idx'),
+            models.Index(Collate(Upper('title'), 'C'), include=['title'], name='ad_title_prefix_idx'),
+        ]
 
 
 class Review(models.Model):
     """Модель отзыва"""
     text = models.CharField(max_length=300, verbose_name='Текст')
-    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='Автор')
-    ad = models.ForeignKey(Ad, on_delete=models.CASCADE, verbose_name='Объявление')
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False,
+                               verbose_name='Автор')
+    ad = models.ForeignKey(Ad, on_delete=models.CASCADE, db_index=False, verbose_name='Объявление')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата и время создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата и время изменения')
 
     def __str__(self):
         return self.text
@@ -33,3 +60,8 @@ class Review(models.Model):
     class Meta:
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
+        indexes = [
+            models.Index(fields=['ad', '-created_at', '-id'], name='review_ad_created_at_idx'),
+            models.Index(fields=['ad', 'updated_at'], name='review_ad_updated_at_idx'),
+            models.Index(fields=['author', '-created_at', '-id'], name='review_author_created_at_idx'),
+        ]
@@ -1,4 +1,12 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class AdPagination(PageNumberPagination):
@@ -6,3 +14,123 @@ class AdPagination(PageNumberPagination):
     page_size = 2
     page_size_query_param = 'page_size'
     max_page_size = 4
+
+
+class KeysetPagination(BasePagination):
+    """
+    Базовый класс keyset-пагинации по паре (created_at, id).
+    Страница выбирается условием по индексу, без OFFSET и COUNT(*),
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    """
+    page_size = 2
+    page_size_query_param = 'page_size'
+    max_page_size = 4
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    # Поля, по которым строится курсор; они читаются из БД даже при выборочных полях ответа
+    position_fields = ('created_at', 'id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        """Асинхронный вариант paginate_queryset для эндпоинтов на async ORM"""
+        return self.set_page([row async for row in self.get_page_queryset(queryset, request).aiterator()])
+
+    def get_page_queryset(self, queryset, request):
+        """Срез queryset для текущей страницы с одной лишней строкой для проверки следующей"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+        self.reverse = self.cursor is not None and self.cursor[2]
+
+        if self.cursor is not None:
+            created_at, pk, reverse = self.cursor
+            if reverse:
+                queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk))
+            else:
+                queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk))
+
+        if self.reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            created_at, pk, reverse = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split('|')
+            return datetime.fromisoformat(created_at), int(pk), bool(int(reverse))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse=False):
+        # Строка страницы - объект модели или словарь values()
+        created_at, pk = (row['created_at'], row['id']) if isinstance(row, dict) else (row.created_at, row.pk)
+        position = f'{created_at.isoformat()}|{pk}|{int(reverse)}'
+        return urlsafe_b64encode(position.encode('ascii')).decode('ascii')
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(self.page[0], reverse=True))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class AdCursorPagination(KeysetPagination):
+    """Класс для курсорной пагинации ленты объявлений"""
+
+
+class ReviewCursorPagination(KeysetPagination):
+    """Класс для курсорной пагинации отзывов объявления"""
+    page_size = 10
+    max_page_size = 50
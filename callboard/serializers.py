@@ -1,6 +1,9 @@
+from django.urls import reverse
 from rest_framework import serializers
+from rest_framework.utils.urls import replace_query_param
 
 from callboard.models import Ad, Review
+from callboard.paginators import ReviewCursorPagination
 
 
 class ReviewSerializers(serializers.ModelSerializer):
@@ -13,6 +16,8 @@ class ReviewSerializers(serializers.ModelSerializer):
 
 class ReviewChangeSerializers(serializers.ModelSerializer):
     """Сериализатор создания, изменения отзыва"""
+    # Для проверки объявления достаточно его id
+    ad = serializers.PrimaryKeyRelatedField(queryset=Ad.objects.only('id'))
 
     class Meta:
         model = Review
@@ -20,12 +25,24 @@ class ReviewChangeSerializers(serializers.ModelSerializer):
 
 
 class AdRetrieveSerializer(serializers.ModelSerializer):
-    """Сериализатор просмотра товара"""
-    review_list = ReviewSerializers(source='review_set', many=True, read_only=True)
+    """Сериализатор просмотра товара с последними отзывами"""
+    review_list = ReviewSerializers(source='latest_reviews', many=True, read_only=True)
+    review_next = serializers.SerializerMethodField()
 
     class Meta:
         model = Ad
-        fields = '__all__'
+        exclude = ('search_vector',)
+
+    def get_review_next(self, obj):
+        if len(obj.latest_reviews) >= obj.review_count:
+            return None
+        pagination = ReviewCursorPagination()
+        url = f"{reverse('ads:review-list')}?ad_id={obj.pk}"
+        request = self.context.get('request')
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        return replace_query_param(url, pagination.cursor_query_param,
+                                   pagination.encode_cursor(obj.latest_reviews[-1]))
 
 
 class AdListSerializer(serializers.ModelSerializer):
@@ -33,7 +50,7 @@ class AdListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ad
-        fields = '__all__'
+        exclude = ('search_vector',)
 
 
 class AdSerializer(serializers.ModelSerializer):
@@ -42,3 +59,18 @@ class AdSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ad
         fields = ('title', 'price', 'description')
+
+
+class AdBulkListSerializer(serializers.ListSerializer):
+    """Сериализатор пакетного создания объявлений одним INSERT"""
+    batch_size = 1000
+
+    def create(self, validated_data):
+        return Ad.objects.bulk_create([Ad(**attrs) for attrs in validated_data], batch_size=self.batch_size)
+
+
+class AdBulkSerializer(AdSerializer):
+    """Сериализатор объявления в пакетном создании"""
+
+    class Meta(AdSerializer.Meta):
+        list_serializer_class = AdBulkListSerializer
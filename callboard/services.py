@@ -0,0 +1,34 @@
+from django.db.models import Count, F, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Now
+
+from callboard.models import Ad, Review
+
+
+def review_added(review):
+    """Увеличивает счетчик отзывов объявления и сдвигает время последнего отзыва"""
+    Ad.objects.filter(pk=review.ad_id).update(
+        review_count=F('review_count') + 1,
+        last_review_at=Greatest(F('last_review_at'), Value(review.created_at)),
+        updated_at=Now(),
+    )
+
+
+def review_removed(ad_id):
+    """Уменьшает счетчик отзывов объявления и пересчитывает время последнего отзыва"""
+    Ad.objects.filter(pk=ad_id).update(
+        review_count=Greatest(F('review_count') - 1, 0),
+        last_review_at=Subquery(
+            Review.objects.filter(ad=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+        ),
+        updated_at=Now(),
+    )
+
+
+def rebuild_review_counters(ad_ids):
+    """Пересчитывает счетчики отзывов для переданных объявлений одним запросом"""
+    reviews = Review.objects.filter(ad=OuterRef('pk')).order_by().values('ad')
+    return Ad.objects.filter(pk__in=ad_ids).update(
+        review_count=Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0),
+        last_review_at=Subquery(reviews.annotate(last=Max('created_at')).values('last')),
+        updated_at=Now(),
+    )
@@ -2,8 +2,11 @@ from django.urls import path
 from rest_framework.routers import DefaultRouter
 
 from callboard.apps import CallboardConfig
-from callboard.views import (AdCreateAPIView, AdDestroyAPIView, AdListAPIView,
-                             AdRetrieveAPIView, AdUpdateAPIView,
+from callboard.views import (AdAutocompleteAPIView, AdBulkCreateAPIView,
+                             AdCreateAPIView, AdDestroyAPIView,
+                             AdExportAPIView, AdListAPIView,
+                             AdListAsyncAPIView, AdRetrieveAPIView,
+                             AdRetrieveAsyncAPIView, AdUpdateAPIView,
                              ReviewAPIViewSet)
 
 app_name = CallboardConfig.name
@@ -13,8 +16,13 @@ router.register('review', ReviewAPIViewSet, basename='review')
 
 urlpatterns = [
                   path('', AdListAPIView.as_view(), name='ad_list'),
+                  path('export/', AdExportAPIView.as_view(), name='ad_export'),
+                  path('autocomplete/', AdAutocompleteAPIView.as_view(), name='ad_autocomplete'),
                   path('create/', AdCreateAPIView.as_view(), name='ad_create'),
+                  path('bulk/', AdBulkCreateAPIView.as_view(), name='ad_bulk_create'),
                   path('detail/<int:pk>/', AdRetrieveAPIView.as_view(), name='ad_detail'),
+                  path('async/', AdListAsyncAPIView.as_view(), name='ad_list_async'),
+                  path('async/detail/<int:pk>/', AdRetrieveAsyncAPIView.as_view(), name='ad_detail_async'),
                   path('update/<int:pk>/', AdUpdateAPIView.as_view(), name='ad_update'),
                   path('delete/<int:pk>/', AdDestroyAPIView.as_view(), name='ad_delete'),
               ] + router.urls
@@ -1,30 +1,179 @@
-from rest_framework import generics, viewsets
-from rest_framework.exceptions import ValidationError
-from rest_framework.filters import SearchFilter
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Collate, Upper
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import generics, status, viewsets
+from rest_framework.exceptions import (APIException, AuthenticationFailed,
+                                       NotAuthenticated, ValidationError)
 from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import exception_handler
 
+from callboard.cache import get_ad_list_cache_key, invalidate_ad_list
+from callboard.export import EXPORT_FORMATS
+from callboard.filters import AdSearchFilter
+from callboard.mixins import (ConditionalGetMixin, ProjectionListMixin,
+                              SparseFieldsMixin)
 from callboard.models import Ad, Review
-from callboard.paginators import AdPagination
-from callboard.serializers import (AdListSerializer, AdRetrieveSerializer,
-                                   AdSerializer, ReviewChangeSerializers,
-                                   ReviewSerializers)
+from callboard.paginators import (AdCursorPagination, AdPagination,
+                                  ReviewCursorPagination)
+from callboard.projections import get_field_plan
+from callboard.serializers import (AdBulkSerializer, AdListSerializer,
+                                   AdRetrieveSerializer, AdSerializer,
+                                   ReviewChangeSerializers, ReviewSerializers)
+from callboard.services import (rebuild_review_counters, review_added,
+                                review_removed)
+from users.authentication import AsyncJWTAuthentication
 from users.permissions import IsAutor
 
 
-class AdListAPIView(generics.ListAPIView):
-    """Эндпоинт просмотра списка объявлений"""
+class AdListAPIView(ConditionalGetMixin, ProjectionListMixin, generics.ListAPIView):
+    """
+    Эндпоинт просмотра списка объявлений.
+    По умолчанию используется курсорная пагинация, постраничная доступна через ?pagination=page.
+    Результаты поиска упорядочены по релевантности и поэтому всегда разбиваются постранично.
+    При общем кэше (SHARED_CACHE) страницы кэшируются до следующего изменения объявлений, без него ETag
+    считается по выбранной странице.
+    Строки кодируются без моделей, а ?fields=/?omit= сокращают ответ и читаемые колонки, см. ProjectionListMixin
+    """
     serializer_class = AdListSerializer
     permission_classes = [AllowAny]
     queryset = Ad.objects.all()
-    pagination_class = AdPagination
-    filter_backends = [SearchFilter]
-    search_fields = ['title']
+    pagination_class = AdCursorPagination
+    filter_backends = [AdSearchFilter]
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.request is not None and (self.request.query_params.get('pagination') == 'page'
+                                             or AdSearchFilter().get_search_term(self.request)):
+                self._paginator = AdPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
-class AdRetrieveAPIView(generics.RetrieveAPIView):
-    """Эндпоинт просмотра одного объявления"""
+    def list(self, request, *args, **kwargs):
+        if not settings.SHARED_CACHE:
+            # Без общего кэша нет поколения, отмечающего удаления, а MAX/COUNT по всей выборке не ограничен
+            return self.get_page_conditional_response(request, super().list, *args, **kwargs)
+        self.cache_key = get_ad_list_cache_key(request)
+        return self.get_conditional_response(request, self.get_cached_list, *args, **kwargs)
+
+    def get_cached_list(self, request, *args, **kwargs):
+        data = cache.get(self.cache_key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        cache.set(self.cache_key, response.data, settings.AD_LIST_CACHE_TIMEOUT)
+        return response
+
+    def get_validators(self):
+        validators_key = f'{self.cache_key}:validators'
+        validators = cache.get(validators_key)
+        if validators is None:
+            # Удаления учитываются поколением кэша в ключе, поэтому COUNT по всей таблице не нужен
+            last_modified = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+                last_modified=Max('updated_at'))['last_modified']
+            validators = self.make_list_validators(last_modified, self.cache_key)
+            cache.set(validators_key, validators, settings.AD_LIST_CACHE_TIMEOUT)
+        return validators
+
+
+class AdExportAPIView(generics.GenericAPIView):
+    """
+    Эндпоинт выгрузки всех объявлений в NDJSON или CSV (?export_format=csv).
+    Строки читаются серверным курсором и кодируются без сериализатора, ответ отдается потоком
+    """
+    queryset = Ad.objects.all()
+    chunk_size = 2000
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError({'export_format': [f'Поддерживаемые форматы: {", ".join(EXPORT_FORMATS)}.']})
+        encode, content_type = EXPORT_FORMATS[export_format]
+        # Поля и их порядок совпадают с выдачей списка объявлений
+        fields = list(AdListSerializer().fields)
+        rows = self.get_queryset().order_by('-created_at', '-id').values_list(*fields).iterator(
+            chunk_size=self.chunk_size)
+        response = StreamingHttpResponse(encode(fields, rows, self.chunk_size), content_type=content_type)
+        response.headers['Content-Disposition'] = f'attachment; filename="ads.{export_format}"'
+        return response
+
+
+class AdAutocompleteAPIView(generics.GenericAPIView):
+    """
+    Эндпоинт подсказок названий объявлений по ?q=.
+    Сначала ищет совпадения по префиксу через покрывающий индекс, затем добирает нечеткие по триграммам
+    """
+    permission_classes = [AllowAny]
+    queryset = Ad.objects.all()
+    min_query_length = 2
+    suggestions_limit = 10
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').replace('\x00', '').strip()
+        if len(query) < self.min_query_length:
+            return Response({'results': []})
+
+        suggestions = []
+        prefix_titles = self.get_queryset().alias(title_upper=Collate(Upper('title'), 'C')).filter(
+            title_upper__startswith=query.upper()).order_by('title_upper').values_list('title', flat=True)
+        self._collect(suggestions, prefix_titles[:self.suggestions_limit * 2])
+        if len(suggestions) < self.suggestions_limit:
+            similar_titles = self.get_queryset().filter(title__trigram_word_similar=query).annotate(
+                similarity=TrigramWordSimilarity(query, 'title')
+            ).order_by('-similarity').values_list('title', flat=True)
+            self._collect(suggestions, similar_titles[:self.suggestions_limit * 2])
+        return Response({'results': suggestions})
+
+    def _collect(self, suggestions, titles):
+        for title in titles:
+            if len(suggestions) == self.suggestions_limit:
+                break
+            if title not in suggestions:
+                suggestions.append(title)
+
+
+class AdRetrieveAPIView(ConditionalGetMixin, SparseFieldsMixin, generics.RetrieveAPIView):
+    """
+    Эндпоинт просмотра одного объявления.
+    Содержит только последние отзывы, их общее количество и ссылку на следующую страницу отзывов.
+    Если ни отзывы, ни ссылка не запрошены через ?fields=/?omit=, отзывы не читаются
+    """
     serializer_class = AdRetrieveSerializer
     queryset = Ad.objects.all()
+    review_preview_size = 5
+    sparse_field_columns = {'review_next': ('review_count',)}
+
+    def get_object(self):
+        ad = super().get_object()
+        fields = self.get_sparse_fields()
+        if fields is None or 'review_list' in fields or 'review_next' in fields:
+            ad.latest_reviews = list(
+                Review.objects.filter(ad=ad).order_by('-created_at', '-id')[:self.review_preview_size]
+            )
+        return ad
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(request, super().retrieve, *args, **kwargs)
+
+    def get_validators(self):
+        reviews_updated_at = Review.objects.filter(ad=OuterRef('pk')).order_by('-updated_at').values('updated_at')
+        state = self.queryset.filter(pk=self.kwargs['pk']).values('updated_at', 'review_count').annotate(
+            reviews_updated_at=Subquery(reviews_updated_at[:1])
+        ).order_by('pk').first()
+        if state is None:
+            return None, None
+        last_modified = max(filter(None, (state['updated_at'], state['reviews_updated_at'])))
+        return self.make_validators(last_modified, self.kwargs['pk'], state['review_count'],
+                                    state['reviews_updated_at'])
 
 
 class AdCreateAPIView(generics.CreateAPIView):
@@ -34,35 +183,117 @@ class AdCreateAPIView(generics.CreateAPIView):
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        invalidate_ad_list()
+
+
+class PayloadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Слишком большое тело запроса.'
+    default_code = 'payload_too_large'
+
+
+class AdBulkCreateAPIView(generics.CreateAPIView):
+    """
+    Эндпоинт пакетного создания объявлений.
+    Принимает список объявлений, проверяет их вместе и сохраняет одной транзакцией через bulk_create.
+    При ошибках ничего не сохраняется, а в ответе возвращаются ошибки по каждому элементу.
+    Пакет ограничен количеством объявлений и размером тела: JSON-парсер DRF читает request.stream,
+    и DATA_UPLOAD_MAX_MEMORY_SIZE к нему не применяется
+    """
+    serializer_class = AdBulkSerializer
+    queryset = Ad.objects.all()
+    max_batch_size = 5000
+    max_body_size = 10 * 1024 * 1024
+
+    def create(self, request, *args, **kwargs):
+        try:
+            content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        # Тело без Content-Length Django не читает, поэтому заголовка достаточно
+        if content_length > self.max_body_size:
+            raise PayloadTooLarge()
+        serializer = self.get_serializer(data=request.data, many=True, allow_empty=False,
+                                         max_length=self.max_batch_size)
+        serializer.is_valid(raise_exception=True)
+        ads = self.perform_create(serializer)
+        return Response(AdListSerializer(ads, many=True).data, status=status.HTTP_201_CREATED)
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        ads = serializer.save(author=self.request.user)
+        invalidate_ad_list()
+        return ads
 
 
 class AdUpdateAPIView(generics.UpdateAPIView):
     """Эндпоинт изменения объявления"""
     permission_classes = [IsAdminUser | IsAutor]
     serializer_class = AdSerializer
-    queryset = Ad.objects.all()
+    # Только поля сериализатора, автор для проверки прав и updated_at, который обновляется при сохранении
+    queryset = Ad.objects.only('title', 'price', 'description', 'author_id', 'updated_at')
+
+    def perform_update(self, serializer):
+        serializer.save()
+        invalidate_ad_list()
 
 
 class AdDestroyAPIView(generics.DestroyAPIView):
     """Эндпоинт удаления объявления"""
     permission_classes = [IsAdminUser | IsAutor]
-    queryset = Ad.objects.all()
+    queryset = Ad.objects.only('author_id')
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_ad_list()
 
-class ReviewAPIViewSet(viewsets.ModelViewSet):
-    """ViewSet для комментариев"""
+
+class ReviewAPIViewSet(ConditionalGetMixin, ProjectionListMixin, viewsets.ModelViewSet):
+    """
+    ViewSet для комментариев, список отдается без создания моделей.
+    Список и просмотр поддерживают ?fields=/?omit=, см. ProjectionListMixin
+    """
     queryset = Review.objects.all()
+    pagination_class = ReviewCursorPagination
 
     def get_queryset(self):
         ad_id = self.request.query_params.get('ad_id')
         if self.action == 'list' and ad_id:
             return self.queryset.filter(ad__id=ad_id)
-        elif self.action in ['retrieve', 'destroy', 'update', 'partial_update']:
+        elif self.action == 'update':
+            # Только поля ReviewChangeSerializers, автор для проверки прав и обновляемый updated_at
+            return self.queryset.only('text', 'ad_id', 'author_id', 'updated_at')
+        elif self.action == 'destroy':
+            return self.queryset.only('ad_id', 'author_id')
+        elif self.action in ['retrieve', 'partial_update']:
             return self.queryset
         raise ValidationError("Параметр 'ad_id' обязателен для получения списка комментариев.")
 
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(request, super().list, *args, **kwargs)
+
+    def get_validators(self):
+        return self.make_queryset_validators(self.get_queryset())
+
+    @transaction.atomic
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        review = serializer.save(author=self.request.user)
+        review_added(review)
+        invalidate_ad_list()
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        old_ad_id = serializer.instance.ad_id
+        review = serializer.save()
+        if review.ad_id != old_ad_id:
+            rebuild_review_counters([old_ad_id, review.ad_id])
+            invalidate_ad_list()
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+        review_removed(instance.ad_id)
+        invalidate_ad_list()
 
     def get_serializer_class(self):
         if self.action in ['create', 'update']:
@@ -73,3 +304,68 @@ class ReviewAPIViewSet(viewsets.ModelViewSet):
         if self.action in ['update', 'partial_update', 'destroy']:
             return [IsAutor() or IsAdminUser()]
         return super().get_permissions()
+
+
+class AsyncAPIView(View):
+    """
+    Базовый класс асинхронных эндпоинтов чтения для ASGI.
+    Запросы к БД идут через async ORM без переключения потоков на каждый запрос,
+    а аутентификация, ошибки и JSON-ответы оформляются так же, как в DRF
+    """
+    authentication_required = True
+
+    async def dispatch(self, request, *args, **kwargs):
+        authenticator = AsyncJWTAuthentication()
+        request = Request(request)
+        try:
+            user_auth = await authenticator.aauthenticate(request)
+            if user_auth is not None:
+                request.user, request.auth = user_auth
+            if self.authentication_required and not request.user.is_authenticated:
+                raise NotAuthenticated()
+            return await super().dispatch(request, *args, **kwargs)
+        except (APIException, Http404) as exc:
+            if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+                exc.auth_header = authenticator.authenticate_header(request)
+            response = exception_handler(exc, {})
+            headers = {name: value for name, value in response.headers.items() if name != 'Content-Type'}
+            return self.render(response.data, status=response.status_code, headers=headers)
+
+    def render(self, data, status=200, headers=None):
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        return HttpResponse(renderer.render(data), status=status, headers=headers,
+                            content_type='application/json')
+
+
+class AdListAsyncAPIView(AsyncAPIView):
+    """
+    Асинхронный эндпоинт ленты объявлений с курсорной пагинацией.
+    Поиск, постраничная пагинация и выборочные поля есть только у синхронного списка,
+    и их параметры отклоняются с 400, а не игнорируются молча
+    """
+    authentication_required = False
+    unsupported_query_params = ('search', 'search_mode', 'pagination', 'fields', 'omit')
+
+    async def get(self, request):
+        unsupported = [param for param in self.unsupported_query_params if param in request.query_params]
+        if unsupported:
+            raise ValidationError({param: ['Не поддерживается асинхронной лентой, используйте /ads/.']
+                                   for param in unsupported})
+        paginator = AdCursorPagination()
+        plan = get_field_plan(AdListSerializer)
+        page = await paginator.apaginate_queryset(Ad.objects.values(*plan.columns), request)
+        return self.render(paginator.get_paginated_response(plan.encode(page)).data)
+
+
+class AdRetrieveAsyncAPIView(AsyncAPIView):
+    """Асинхронный эндпоинт просмотра одного объявления с последними отзывами"""
+    review_preview_size = AdRetrieveAPIView.review_preview_size
+
+    async def get(self, request, pk):
+        try:
+            ad = await Ad.objects.aget(pk=pk)
+        except Ad.DoesNotExist:
+            raise Http404(f'No {Ad._meta.object_name} matches the given query.')
+        reviews = Review.objects.filter(ad=ad).order_by('-created_at', '-id')[:self.review_preview_size]
+        ad.latest_reviews = [review async for review in reviews.aiterator()]
+        return self.render(AdRetrieveSerializer(ad, context={'request': request}).data)
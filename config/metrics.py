@@ -0,0 +1,65 @@
+import hmac
+import ipaddress
+import os
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+
+# Метрики помечаются именем маршрута (ads:ad_list), а не путем, чтобы число рядов не зависело от id в URL
+UNRESOLVED_VIEW = '<unresolved>'
+
+REQUESTS = Counter(
+    'http_requests_total', 'Количество обработанных запросов', ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса', ['view', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10),
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Количество SQL-запросов на один запрос', ['view', 'method'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55),
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Размер тела ответа без потоковых ответов', ['view', 'method'],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+)
+
+
+def get_registry():
+    """
+    Реестр для выгрузки метрик.
+    Если задан PROMETHEUS_MULTIPROC_DIR, каждый процесс пишет значения в свои mmap-файлы в этом каталоге,
+    и выгрузка суммирует файлы всех воркеров; каталог должен очищаться перед запуском сервера
+    """
+    if not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def is_metrics_allowed(request):
+    """
+    Доступ к метрикам: с адресов и подсетей METRICS_ALLOWED_IPS или с токеном METRICS_TOKEN
+    в заголовке Authorization: Bearer. Адрес берется из REMOTE_ADDR, а не из X-Forwarded-For,
+    который может подделать клиент
+    """
+    if settings.METRICS_TOKEN:
+        token = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+            return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_IPS)
+
+
+def metrics_view(request):
+    """Эндпоинт метрик в формате Prometheus; для остальных клиентов его как будто нет"""
+    if not is_metrics_allowed(request):
+        raise Http404()
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,334 @@
+import cProfile
+import random
+import time
+from contextvars import ContextVar
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import BaseSerializer
+
+from config.metrics import (REQUEST_LATENCY, REQUEST_QUERIES, REQUESTS,
+                            RESPONSE_SIZE, UNRESOLVED_VIEW)
+from config.slow_queries import SlowQueryLogger, setup_log
+from config.timings import current_timings, serialize_timer
+
+
+class QueryCounter:
+    """Счетчик SQL-запросов одного запроса"""
+
+    def __init__(self):
+        self.count = 0
+
+
+# Постоянные обертки выполнения SQL. Асинхронные эндпоинты выполняют ORM через sync_to_async в другом потоке
+# с его соединениями, поэтому обертки стоят на всех соединениях, а данные текущего запроса приходят
+# в них через контекст, который sync_to_async передает в поток
+permanent_execute_wrappers = []
+
+
+def install_execute_wrappers(connection, **kwargs):
+    """
+    Ставит постоянные обертки на соединение; обработчик сигнала connection_created.
+    Соединение может открыться внутри connection.execute_wrapper() в коде запроса, а он при выходе
+    снимает последнюю обертку списка, поэтому постоянные обертки ставятся в начало
+    """
+    missing = [wrapper for wrapper in permanent_execute_wrappers if wrapper not in connection.execute_wrappers]
+    connection.execute_wrappers[:0] = missing
+
+
+def add_execute_wrapper(wrapper):
+    """Регистрирует постоянную обертку выполнения SQL для открытых и будущих соединений"""
+    if wrapper not in permanent_execute_wrappers:
+        permanent_execute_wrappers.append(wrapper)
+    connection_created.connect(install_execute_wrappers)
+    for connection in connections.all(initialized_only=True):
+        install_execute_wrappers(connection)
+
+
+# Счетчик текущего запроса для метрик
+current_query_counter = ContextVar('current_query_counter', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    """Обертка выполнения SQL, добавляющая запрос к счетчику текущего запроса"""
+    counter = current_query_counter.get()
+    if counter is not None:
+        counter.count += 1
+    return execute(sql, params, many, context)
+
+
+class RequestTimings:
+    """Накопленное время SQL, сериализации и рендеринга одного запроса"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.sql_count += 1
+
+    def start_render(self):
+        self.render_started = time.perf_counter()
+
+    def finish_render(self, response):
+        if self.render_started is not None:
+            self.render_time += time.perf_counter() - self.render_started
+            self.render_started = None
+
+    def get_server_timing(self):
+        """Значение заголовка Server-Timing, длительности в миллисекундах"""
+        total = time.perf_counter() - self.started
+        metrics = [
+            f'sql;dur={self.sql_time * 1000:.2f};desc="{self.sql_count} queries"',
+            f'serialize;dur={self.serialize_time * 1000:.2f}',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]
+        return ', '.join(metrics)
+
+
+def time_query(execute, sql, params, many, context):
+    """Обертка выполнения SQL, добавляющая время запроса к замерам текущего запроса"""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings.execute_wrapper(execute, sql, params, many, context)
+
+
+def timed_data(data):
+    """Обертка BaseSerializer.data, добавляющая время сериализации к замерам запроса"""
+
+    def wrapper(serializer):
+        with serialize_timer():
+            return data.fget(serializer)
+
+    wrapper.profiled = True
+    return property(wrapper)
+
+
+class ProfilingMiddleware:
+    """
+    Профилирование запросов, включается настройкой PROFILING_ENABLED.
+    Каждый ответ получает заголовок Server-Timing с количеством и временем SQL-запросов,
+    временем сериализации и рендеринга, а доля PROFILING_SAMPLE_RATE запросов
+    профилируется cProfile с сохранением дампа в PROFILING_DIR.
+    Вложенные замеры пересекаются: время сериализации включает запросы, выполненные при ней.
+    В асинхронной цепочке SQL замеряется той же постоянной оберткой, а cProfile не включается:
+    он профилирует поток целиком, и в цикле событий в дамп попали бы корутины других запросов.
+    Server-Timing отправляется до тела, поэтому чтение потокового ответа (выгрузки) в замеры не входит
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        add_execute_wrapper(time_query)
+        if not getattr(BaseSerializer.data.fget, 'profiled', False):
+            BaseSerializer.data = timed_data(BaseSerializer.data)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        profile = self.start_profile()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+            if profile is not None:
+                profile.disable()
+        if profile is not None:
+            self.dump_profile(profile, request, timings)
+        response.headers['Server-Timing'] = timings.get_server_timing()
+        return response
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        response.headers['Server-Timing'] = timings.get_server_timing()
+        return response
+
+    def process_template_response(self, request, response):
+        timings = current_timings.get()
+        if timings is not None:
+            timings.start_render()
+            response.add_post_render_callback(timings.finish_render)
+        return response
+
+    def start_profile(self):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # В потоке уже работает другой профилировщик
+            return None
+        return profile
+
+    def dump_profile(self, profile, request, timings):
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        match = request.resolver_match
+        name = match.view_name.replace(':', '.') if match and match.view_name else 'unresolved'
+        elapsed = (time.perf_counter() - timings.started) * 1000
+        profile.dump_stats(directory / f'{time.time_ns()}-{request.method}-{name}-{elapsed:.0f}ms.prof')
+
+
+class MetricsMiddleware:
+    """
+    Метрики Prometheus по запросам: количество, время обработки, число SQL-запросов и размер ответа.
+    Метки - имя маршрута и метод, выгрузка на /metrics/, см. config.metrics.
+    Работает и в синхронной, и в асинхронной цепочке, чтобы не переводить асинхронные эндпоинты в поток
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        add_execute_wrapper(count_query)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = QueryCounter()
+        token = current_query_counter.set(queries)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_query_counter.reset(token)
+        self.observe(request, response, time.perf_counter() - started, queries.count)
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        token = current_query_counter.set(queries)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_query_counter.reset(token)
+        self.observe(request, response, time.perf_counter() - started, queries.count)
+        return response
+
+    def observe(self, request, response, elapsed, query_count):
+        match = request.resolver_match
+        view = match.view_name if match and match.view_name else UNRESOLVED_VIEW
+        REQUESTS.labels(view, request.method, response.status_code).inc()
+        REQUEST_LATENCY.labels(view, request.method).observe(elapsed)
+        REQUEST_QUERIES.labels(view, request.method).observe(query_count)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(view, request.method).observe(len(response.content))
+
+
+# Журнал медленных запросов текущего запроса
+current_slow_query_logger = ContextVar('current_slow_query_logger', default=None)
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """Обертка выполнения SQL, передающая запрос журналу медленных запросов текущего запроса"""
+    slow_query_logger = current_slow_query_logger.get()
+    if slow_query_logger is None:
+        return execute(sql, params, many, context)
+    return slow_query_logger(execute, sql, params, many, context)
+
+
+def iterate_in_context(var, value, content):
+    """Итератор тела потокового ответа, при чтении каждой части которого var имеет значение value"""
+    iterator = iter(content)
+    while True:
+        token = var.set(value)
+        try:
+            chunk = next(iterator, None)
+        finally:
+            var.reset(token)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def aiterate_in_context(var, value, content):
+    """Асинхронный вариант iterate_in_context()"""
+    iterator = aiter(content)
+    while True:
+        token = var.set(value)
+        try:
+            chunk = await anext(iterator, None)
+        finally:
+            var.reset(token)
+        if chunk is None:
+            return
+        yield chunk
+
+
+class SlowQueryLogMiddleware:
+    """
+    Журнал медленных SQL-запросов с именем маршрута, включается настройкой SLOW_QUERY_LOG_ENABLED.
+    Запросы попадают в журнал через постоянную обертку и контекст запроса, поэтому middleware работает
+    и в асинхронной цепочке, а запросы при чтении потокового ответа записываются с его маршрутом.
+    Выборки из серверного курсора идут мимо оберток выполнения SQL, в журнал попадает только его открытие.
+    Отчет по журналу строит команда slow_query_report, см. config.slow_queries
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SLOW_QUERY_LOG_ENABLED:
+            raise MiddlewareNotUsed()
+        setup_log()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        add_execute_wrapper(log_slow_query)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        slow_query_logger = SlowQueryLogger(request)
+        token = current_slow_query_logger.set(slow_query_logger)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_slow_query_logger.reset(token)
+        return self.bind_streaming_content(response, slow_query_logger)
+
+    async def __acall__(self, request):
+        slow_query_logger = SlowQueryLogger(request)
+        token = current_slow_query_logger.set(slow_query_logger)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_slow_query_logger.reset(token)
+        return self.bind_streaming_content(response, slow_query_logger)
+
+    def bind_streaming_content(self, response, slow_query_logger):
+        if response.streaming:
+            iterate = aiterate_in_context if response.is_async else iterate_in_context
+            response.streaming_content = iterate(current_slow_query_logger, slow_query_logger,
+                                                 response.streaming_content)
+        return response
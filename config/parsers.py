@@ -0,0 +1,46 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils import json
+
+from config.renderers import DIGITS, ORJSONRenderer, orjson
+
+# Все цифры заменяются нулем, и 19 цифр подряд ищутся как подстрока: это в разы быстрее регулярного выражения
+TEXT_DIGITS = str.maketrans('123456789', '000000000')
+LONG_NUMBER = b'0' * 19
+LONG_NUMBER_TEXT = '0' * 19
+
+
+def has_long_number(content):
+    """
+    Есть ли в теле 19 цифр подряд: такое целое может не поместиться в 64 бита,
+    и orjson вернет его как float с потерей точности
+    """
+    if isinstance(content, bytes):
+        return LONG_NUMBER in content.translate(DIGITS)
+    return LONG_NUMBER_TEXT in content.translate(TEXT_DIGITS)
+
+
+class ORJSONParser(JSONParser):
+    """
+    JSON-парсер на orjson.
+    orjson не принимает NaN и Infinity, поэтому при STRICT_JSON = False, как и без установленного orjson,
+    работает стандартный JSONParser. Тело с длинными числами разбирает стандартный json,
+    чтобы целые больше 64 бит оставались точными
+    """
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            content = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                content = content.decode(encoding)
+            if has_long_number(content):
+                return json.loads(content)
+            return orjson.loads(content)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,104 @@
+import math
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Даты и время отдаются кодировщику DRF, чтобы формат совпадал с JSONRenderer (Z вместо +00:00)
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+def escape_line_separators(content):
+    """Экранирует U+2028 и U+2029, как JSONRenderer, чтобы JSON оставался подмножеством JavaScript"""
+    if b'\xe2\x80' not in content:
+        return content
+    return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+# Типы значений, среди которых нет чисел с плавающей точкой и вложенных структур
+LEAF_TYPES = frozenset({str, int, bool, type(None)})
+
+# Все цифры заменяются нулем, чтобы искать число перед экспонентой одной подстрокой
+DIGITS = bytes.maketrans(b'123456789', b'000000000')
+
+
+def has_differing_floats(data):
+    """
+    Есть ли в данных числа, которые orjson запишет не так, как стандартный json:
+    NaN и бесконечность (orjson пишет null) и числа, которые стандартный json пишет в экспоненциальной
+    записи, меньше 1e-4 и от 1e16 по модулю (1e-05 и 1e+16 против 0.00001 и 1e16 у orjson)
+    """
+    pending = [data]
+    while pending:
+        values = pending.pop()
+        if isinstance(values, dict):
+            values = values.values()
+        elif not isinstance(values, (list, tuple)):
+            values = (values,)
+        # Строки ответа обычно состоят из строк и целых, такие проверяются одним сравнением множеств
+        if set(map(type, values)) <= LEAF_TYPES:
+            continue
+        for value in values:
+            if isinstance(value, float):
+                if not math.isfinite(value) or (value and not 1e-4 <= abs(value) < 1e16):
+                    return True
+            elif isinstance(value, (dict, list, tuple)):
+                pending.append(value)
+    return False
+
+
+def is_orjson_lossy(data, content):
+    """
+    Проверяет, не заменил ли orjson NaN или бесконечность на null и не записал ли числа иначе,
+    чем стандартный json. Данные обходятся, только если в выдаче есть null, экспонента или 0.0000,
+    поэтому обычные ответы проверка почти не замедляет
+    """
+    if b'null' not in content and b'0.0000' not in content and b'0e' not in content.translate(DIGITS):
+        return False
+    return has_differing_floats(data)
+
+
+# Для построчного кодирования кодировщик создается один раз
+encoder = encoders.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(data):
+    """
+    Компактный JSON в UTF-8 с обработкой типов кодировщиком DRF; без orjson - через стандартный json.
+    NaN и бесконечность, как и в стандартном json, кодируются как NaN и Infinity, числа - в его же форме
+    """
+    if orjson is not None:
+        content = orjson.dumps(data, default=encoder.default, option=ORJSON_OPTIONS)
+        if not is_orjson_lossy(data, content):
+            return content
+    return encoder.encode(data).encode()
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSON-рендерер на orjson, выдача совпадает с JSONRenderer.
+    Типы, которых orjson не знает (Decimal, ленивые строки перевода, даты), кодирует JSONEncoder DRF.
+    С отступами (браузерный API, ?indent=), ensure_ascii, без compact или без установленного orjson
+    работает стандартный JSONRenderer. Он же кодирует данные с NaN и бесконечностью:
+    orjson записал бы их как null, а JSONRenderer при STRICT_JSON отвечает ошибкой,
+    и с числами, которые orjson записывает в другой форме, см. has_differing_floats()
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (orjson is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # Например, целые больше 64 бит, которые стандартный json кодирует
+            return super().render(data, accepted_media_type, renderer_context)
+        if is_orjson_lossy(data, content):
+            return super().render(data, accepted_media_type, renderer_context)
+        return escape_line_separators(content)
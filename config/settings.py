@@ -47,6 +47,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework',
     'rest_framework_simplejwt',
@@ -58,6 +59,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.middleware.MetricsMiddleware',
+    'config.middleware.ProfilingMiddleware',
+    'config.middleware.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -144,6 +148,27 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Кэш общий для всех процессов только на Redis. У LocMemCache свой кэш в каждом воркере, поэтому
+# без REDIS_URL кэш страниц списка объявлений выключен: сброс поколения дошел бы только до одного процесса
+SHARED_CACHE = bool(os.getenv('REDIS_URL'))
+
+# Время жизни закэшированных страниц списка объявлений, сек
+AD_LIST_CACHE_TIMEOUT = 300
+
 CORS_ALLOWED_ORIGINS = [
     "https://localhost:8000",  # Замените на адрес frontend-сервера
 ]
@@ -155,19 +180,54 @@ CORS_ALLOW_ALL_ORIGINS = False
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON на orjson, без установленного orjson - стандартный json, см. config.renderers
+    'DEFAULT_RENDERER_CLASSES': [
+        'config.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'config.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=25),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
-    "UPDATE_LAST_LOGIN": True,
+    # При общем кэше время входа пишется в журнал и сбрасывается в БД пакетами, см. users.services.record_login
+    "UPDATE_LAST_LOGIN": False,
+    "TOKEN_OBTAIN_SERIALIZER": "users.serializers.UserTokenObtainPairSerializer",
 }
 
+# Как часто журнал входов сбрасывается в БД, сек
+LAST_LOGIN_FLUSH_INTERVAL = 5
+
+# Время жизни снимка пользователя для JWT-аутентификации, сек
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Доступ к /metrics/: адреса и подсети через запятую или токен Bearer, см. config.metrics.is_metrics_allowed
+METRICS_ALLOWED_IPS = (os.getenv('METRICS_ALLOWED_IPS') or '127.0.0.1,::1').split(',')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Профилирование запросов: заголовок Server-Timing и дампы cProfile для доли запросов, см. config.middleware
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE') or 0)
+PROFILING_DIR = BASE_DIR / 'profiles'
+
+# Журнал SQL-запросов дольше порога, мс; для доли из них к записи прикладывается EXPLAIN ANALYZE
+SLOW_QUERY_LOG_ENABLED = os.getenv('SLOW_QUERY_LOG_ENABLED') == 'True'
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS') or 200)
+SLOW_QUERY_EXPLAIN_RATE = float(os.getenv('SLOW_QUERY_EXPLAIN_RATE') or 0.1)
+SLOW_QUERY_LOG_DIR = BASE_DIR / 'logs'
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUP_COUNT = 5
+
 AUTH_USER_MODEL = 'users.User'
 
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
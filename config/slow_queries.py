@@ -0,0 +1,136 @@
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger('config.slow_queries')
+logger.propagate = False
+
+LOG_FILE_PATTERN = 'slow_queries-*.jsonl*'
+
+NORMALIZE_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def normalize_sql(sql):
+    """Заменяет литералы и параметры на ?, списки IN - на (...), чтобы похожие запросы совпадали"""
+    for pattern, replacement in NORMALIZE_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def get_fingerprint(normalized_sql):
+    return hashlib.md5(normalized_sql.encode()).hexdigest()[:16]
+
+
+def setup_log():
+    """
+    Подключает к журналу файл текущего процесса в SLOW_QUERY_LOG_DIR с ротацией по размеру.
+    У каждого процесса свой файл, поэтому воркеры не мешают друг другу при ротации
+    """
+    if logger.handlers:
+        return
+    directory = Path(settings.SLOW_QUERY_LOG_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    handler = RotatingFileHandler(directory / f'slow_queries-{os.getpid()}.jsonl', encoding='utf-8',
+                                  maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES,
+                                  backupCount=settings.SLOW_QUERY_LOG_BACKUP_COUNT, delay=True)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+
+def explain(connection, sql, params):
+    """
+    План запроса с фактическим временем выполнения; запрос выполняется повторно, поэтому только для SELECT.
+    Выполняется через отдельный курсор драйвера, чтобы не сбить результат исходного запроса
+    и не попасть в обертки выполнения SQL, а ошибка откатывается до точки сохранения
+    """
+    if connection.vendor != 'postgresql' or not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    with connection.connection.cursor() as cursor:
+        savepoint = connection.in_atomic_block
+        if savepoint:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        except connection.Database.DatabaseError:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return None
+        if savepoint:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+class SlowQueryLogger:
+    """
+    Обертка выполнения SQL, записывающая запросы дольше SLOW_QUERY_THRESHOLD_MS в журнал JSONL.
+    Для доли SLOW_QUERY_EXPLAIN_RATE медленных запросов к записи прикладывается EXPLAIN ANALYZE.
+    Параметры запросов в журнал не пишутся
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+            self.log(sql, params, many, context['connection'], duration)
+        return result
+
+    def log(self, sql, params, many, connection, duration):
+        normalized = normalize_sql(sql)
+        match = self.request.resolver_match
+        plan = None
+        if not many and random.random() < settings.SLOW_QUERY_EXPLAIN_RATE:
+            plan = explain(connection, sql, params)
+        logger.info(json.dumps({
+            'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+            'duration_ms': round(duration, 2),
+            'view': match.view_name if match else None,
+            'fingerprint': get_fingerprint(normalized),
+            'sql': normalized,
+            'plan': plan,
+        }, ensure_ascii=False))
+
+
+def read_entries(directory):
+    """Записи журнала из файлов всех процессов, включая ротированные"""
+    for path in sorted(Path(directory).glob(LOG_FILE_PATTERN)):
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def aggregate(entries):
+    """Сводка по отпечаткам запросов, отсортированная по суммарному времени"""
+    stats = {}
+    for entry in entries:
+        item = stats.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'], 'sql': entry['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'views': {}, 'plan': None, 'plan_ms': 0.0,
+        })
+        item['count'] += 1
+        item['total_ms'] += entry['duration_ms']
+        item['max_ms'] = max(item['max_ms'], entry['duration_ms'])
+        item['views'][entry['view']] = item['views'].get(entry['view'], 0) + 1
+        if entry['plan'] is not None and entry['duration_ms'] >= item['plan_ms']:
+            item['plan'], item['plan_ms'] = entry['plan'], entry['duration_ms']
+    return sorted(stats.values(), key=lambda item: item['total_ms'], reverse=True)
@@ -0,0 +1,21 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Замеры текущего запроса; сериализаторы дописывают в них свое время.
+# Модуль без зависимостей от Django, чтобы кодирование ответов не импортировало middleware
+current_timings = ContextVar('current_timings', default=None)
+
+
+@contextmanager
+def serialize_timer():
+    """Добавляет время блока к времени сериализации текущего запроса, если запрос профилируется"""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.serialize_time += time.perf_counter() - started
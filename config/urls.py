@@ -22,6 +22,7 @@ from drf_yasg.views import get_schema_view
 from rest_framework import permissions
 
 from config import settings
+from config.metrics import metrics_view
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -40,6 +41,7 @@ urlpatterns = [
     path('users/', include('users.urls', namespace='users')),
     path('ads/', include('callboard.urls', namespace='ads')),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
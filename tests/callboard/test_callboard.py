@@ -1,8 +1,24 @@
+import csv
+import io
+import json
+
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Max
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
 
+from callboard.bulk import COPY_NULL, decode_copy_line, escape_copy_value
 from callboard.models import Ad, Review
+from callboard.projections import get_field_plan
+from callboard.serializers import AdListSerializer, ReviewSerializers
 from tests.conftest import fake
+from users.models import User
 
 
 @pytest.mark.django_db
@@ -31,10 +47,262 @@ class TestAd:
             user = request.getfixturevalue(auth_user)
             api_client.force_authenticate(user=user)
             client = api_client
-        response = client.get(reverse('ads:ad_list'))
+        response = client.get(reverse('ads:ad_list'), data={'pagination': 'page'})
         assert response.status_code == expected_status
         assert response.data['count'] == len(ads_users)
 
+    def test_ad_list_cursor(self, api_client, ads_users):
+        """
+        Тестирование курсорной пагинации списка объявлений
+        [GET] http://127.0.0.1:8000/ads/?cursor={str:cursor}
+        """
+        expected = sorted(ads_users, key=lambda ad: (ad.created_at, ad.pk), reverse=True)
+        response = api_client.get(reverse('ads:ad_list'), data={'page_size': 2})
+        assert response.status_code == 200
+        assert 'count' not in response.data
+        assert response.data['previous'] is None
+        received = [ad['id'] for ad in response.data['results']]
+        while response.data['next']:
+            response = api_client.get(response.data['next'])
+            assert response.status_code == 200
+            received += [ad['id'] for ad in response.data['results']]
+        assert received == [ad.pk for ad in expected]
+
+        response = api_client.get(response.data['previous'])
+        assert [ad['id'] for ad in response.data['results']] == [ad.pk for ad in expected[2:4]]
+
+    def test_ad_list_cursor_same_created_at(self, api_client, ads_users):
+        """Тестирование курсорной пагинации объявлений с одинаковым временем создания"""
+        Ad.objects.update(created_at=ads_users[0].created_at)
+        received = []
+        url = reverse('ads:ad_list')
+        while url:
+            response = api_client.get(url)
+            received += [ad['id'] for ad in response.data['results']]
+            url = response.data['next']
+        assert received == sorted((ad.pk for ad in ads_users), reverse=True)
+
+    def test_ad_list_cache(self, api_client, user_client, ads_users, django_assert_num_queries,
+                           django_capture_on_commit_callbacks):
+        """Тестирование кэширования списка объявлений и его сброса при изменении объявлений"""
+        url = reverse('ads:ad_list')
+        first_page = api_client.get(url).data
+        with django_assert_num_queries(0):
+            assert api_client.get(url).data == first_page
+
+        api_client.force_authenticate(user=user_client)
+        with django_capture_on_commit_callbacks(execute=True):
+            response = api_client.post(reverse('ads:ad_create'), data={
+                "title": fake.sentence(nb_words=4),
+                "price": fake.random_int(min=100, max=10000),
+                "description": fake.text(),
+            }, format='json')
+        assert response.status_code == 201
+        assert api_client.get(url).data['results'][0]['title'] == response.data['title']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            api_client.delete(reverse('ads:ad_delete', kwargs={"pk": Ad.objects.latest('created_at').pk}))
+        assert api_client.get(url).data == first_page
+
+    def test_ad_list_without_shared_cache(self, settings, api_client, ads_users, django_assert_num_queries):
+        """Тестирование списка без общего кэша: страниц в кэше нет, ETag меняется после удаления в другом процессе"""
+        settings.SHARED_CACHE = False
+        url = reverse('ads:ad_list')
+        response = api_client.get(url)
+        # Только запрос страницы: ETag считается по ней, без агрегата по всей таблице
+        with django_assert_num_queries(1):
+            assert api_client.get(url).data == response.data
+        # Удаление без сброса поколения, как в другом воркере со своим LocMemCache
+        deleted_pk = response.data['results'][0]['id']
+        Ad.objects.filter(pk=deleted_pk).delete()
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=response.headers['ETag'])
+        assert response.status_code == 200
+        assert deleted_pk not in [ad['id'] for ad in response.data['results']]
+        assert api_client.get(url, HTTP_IF_NONE_MATCH=response.headers['ETag']).status_code == 304
+
+    def test_ad_list_conditional_get(self, api_client, ads_users):
+        """Тестирование условного GET списка объявлений"""
+        url = reverse('ads:ad_list')
+        etag = api_client.get(url).headers['ETag']
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        response = api_client.get(url, data={'pagination': 'page'}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        # Без Last-Modified запрос только с If-Modified-Since после удаления не получит 304 со старым списком
+        assert 'Last-Modified' not in response.headers
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize('serializer_class, model', [
+        (AdListSerializer, Ad),
+        (ReviewSerializers, Review),
+    ])
+    def test_field_plan_matches_serializer(self, ads_users, ad_with_reviews, serializer_class, model):
+        """Тестирование плана полей: байт в байт совпадает с выдачей сериализатора"""
+        Ad.objects.filter(pk=ad_with_reviews.pk).update(created_at='2024-05-01T12:30:00.123456+03:00')
+        queryset = model.objects.order_by('pk')
+        plan = get_field_plan(serializer_class)
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        assert JSONRenderer().render(plan.encode(queryset.values(*plan.columns))) == expected
+        assert b'null' in expected or model is Review
+
+    @pytest.mark.parametrize('params, expected_fields', [
+        ({'fields': 'id,title,price'}, ['id', 'title', 'price']),
+        ({'fields': 'price, id'}, ['id', 'price']),
+        ({'omit': 'description,updated_at'}, ['id', 'title', 'price', 'created_at', 'review_count',
+                                              'last_review_at', 'author']),
+        ({'fields': 'id,title', 'omit': 'title'}, ['id']),
+    ])
+    def test_ad_list_sparse_fields(self, api_client, ads_users, params, expected_fields):
+        """Тестирование выборочных полей ленты: ответ и SQL только с запрошенными колонками"""
+        received = []
+        url, data = reverse('ads:ad_list'), {**params, 'page_size': 2}
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = api_client.get(url, data=data)
+            assert response.status_code == 200
+            select, = [query['sql'] for query in queries if 'LIMIT' in query['sql']]
+            assert ('"callboard_ad"."description"' in select) == ('description' in expected_fields)
+            assert all(list(ad) == expected_fields for ad in response.data['results'])
+            received += response.data['results']
+            url, data = response.data['next'], None
+        assert len(received) == len(ads_users)
+
+    @pytest.mark.parametrize('params', [{'fields': 'id,secret'}, {'omit': 'search_vector'}])
+    def test_ad_list_sparse_fields_unknown(self, api_client, params):
+        """Тестирование ошибки при неизвестных полях"""
+        response = api_client.get(reverse('ads:ad_list'), data=params)
+        assert response.status_code == 400
+        assert list(response.data) == list(params)
+
+    @pytest.mark.parametrize('url_name', ['ads:ad_list', 'ads:ad_detail'])
+    def test_sparse_fields_empty(self, api_client, user_client, ad_user, url_name):
+        """Тестирование ошибки, когда после ?fields=/?omit= не остается ни одного поля"""
+        api_client.force_authenticate(user=user_client)
+        url = reverse(url_name, kwargs={'pk': ad_user.pk} if url_name == 'ads:ad_detail' else {})
+        data = api_client.get(url).data
+        all_fields = ','.join(data['results'][0] if 'results' in data else data)
+        for params in ({'fields': 'title', 'omit': 'title'}, {'omit': all_fields}):
+            response = api_client.get(url, data=params)
+            assert response.status_code == 400
+            assert list(response.data) == ['omit']
+
+    def test_ad_list_invalid_cursor(self, api_client):
+        """Тестирование списка объявлений с неверным курсором"""
+        response = api_client.get(reverse('ads:ad_list'), data={'cursor': 'invalid'})
+        assert response.status_code == 404
+
+    def test_ad_search(self, api_client, ad_create, user_client):
+        """
+        Тестирование полнотекстового поиска объявлений
+        [GET] http://127.0.0.1:8000/ads/?search={str:search}
+        """
+        in_description = ad_create(user_client)
+        in_description.description = 'Продаю велосипеды в хорошем состоянии'
+        in_description.save()
+        in_title = ad_create(user_client)
+        in_title.title = 'Горный велосипед'
+        in_title.save()
+        ad_create(user_client)
+
+        response = api_client.get(reverse('ads:ad_list'), data={'search': 'велосипед'})
+        assert response.status_code == 200
+        assert response.data['count'] == 2
+        assert [ad['id'] for ad in response.data['results']] == [in_title.pk, in_description.pk]
+        assert 'search_vector' not in response.data['results'][0]
+
+    def test_ad_search_websearch_syntax(self, api_client, ad_create, user_client):
+        """Тестирование поиска объявлений с исключением слова"""
+        bike = ad_create(user_client)
+        bike.title = 'Горный велосипед'
+        bike.save()
+        child_bike = ad_create(user_client)
+        child_bike.title = 'Детский велосипед'
+        child_bike.save()
+
+        response = api_client.get(reverse('ads:ad_list'), data={'search': 'велосипед -детский'})
+        assert [ad['id'] for ad in response.data['results']] == [bike.pk]
+
+    def test_ad_search_trigram(self, api_client, ad_create, user_client):
+        """
+        Тестирование нечеткого поиска объявлений по названию
+        [GET] http://127.0.0.1:8000/ads/?search={str:search}&search_mode=trigram
+        """
+        bike = ad_create(user_client)
+        bike.title = 'Велосипед'
+        bike.save()
+        ad_create(user_client)
+
+        response = api_client.get(reverse('ads:ad_list'), data={'search': 'велсипед', 'search_mode': 'trigram'})
+        assert response.status_code == 200
+        assert [ad['id'] for ad in response.data['results']] == [bike.pk]
+
+    @pytest.mark.parametrize("auth_user, expected_status", [
+        ("user_admin", 200),
+        ("user_client", 200),
+        ("anonymous_user", 401),
+    ])
+    def test_ad_export(self, request, api_client, ads_users, ad_with_reviews, auth_user, expected_status):
+        """
+        Тестирование выгрузки объявлений в NDJSON
+        [GET] http://127.0.0.1:8000/ads/export/
+        """
+        if auth_user != "anonymous_user":
+            api_client.force_authenticate(user=request.getfixturevalue(auth_user))
+        response = api_client.get(reverse('ads:ad_export'))
+        assert response.status_code == expected_status
+        if response.status_code == 200:
+            assert response['Content-Type'] == 'application/x-ndjson'
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            expected = AdListSerializer(Ad.objects.order_by('-created_at', '-id'), many=True).data
+            assert [json.loads(line) for line in lines] == json.loads(JSONRenderer().render(expected))
+
+    def test_ad_export_csv(self, api_client, user_client, ad_with_reviews, ad_admin):
+        """Тестирование выгрузки объявлений в CSV"""
+        api_client.force_authenticate(user=user_client)
+        response = api_client.get(reverse('ads:ad_export'), data={'export_format': 'csv'})
+        assert response.status_code == 200
+        assert response['Content-Disposition'] == 'attachment; filename="ads.csv"'
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        assert [int(row['id']) for row in rows] == list(
+            Ad.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        rows = {int(row['id']): row for row in rows}
+        ad_with_reviews.refresh_from_db()
+        assert rows[ad_admin.pk]['last_review_at'] == ''
+        assert rows[ad_with_reviews.pk]['review_count'] == str(ad_with_reviews.review_count)
+        assert rows[ad_with_reviews.pk]['last_review_at'].endswith('Z')
+
+    def test_ad_export_invalid_format(self, api_client, user_client):
+        """Тестирование выгрузки объявлений в неподдерживаемом формате"""
+        api_client.force_authenticate(user=user_client)
+        response = api_client.get(reverse('ads:ad_export'), data={'export_format': 'xml'})
+        assert response.status_code == 400
+
+    def test_ad_autocomplete(self, api_client, ad_create, user_client):
+        """
+        Тестирование подсказок названий объявлений
+        [GET] http://127.0.0.1:8000/ads/autocomplete/?q={str:q}
+        """
+        for title in ('Велосипед горный', 'велосипед детский', 'Велосипед горный', 'Самокат', 'Новый велосипед'):
+            ad = ad_create(user_client)
+            ad.title = title
+            ad.save()
+
+        response = api_client.get(reverse('ads:ad_autocomplete'), data={'q': 'велосипед'})
+        assert response.status_code == 200
+        assert response.data['results'] == ['Велосипед горный', 'велосипед детский', 'Новый велосипед']
+
+        response = api_client.get(reverse('ads:ad_autocomplete'), data={'q': 'велосипд'})
+        assert set(response.data['results']) == {'Велосипед горный', 'велосипед детский', 'Новый велосипед'}
+
+    @pytest.mark.parametrize("query", ["", "в", "%%"])
+    def test_ad_autocomplete_short_query(self, api_client, ad_user, query):
+        """Тестирование подсказок названий объявлений по слишком короткому запросу"""
+        response = api_client.get(reverse('ads:ad_autocomplete'), data={'q': query})
+        assert response.status_code == 200
+        assert response.data['results'] == []
+
     @pytest.mark.parametrize("auth_user, expected_status", [
         ("user_client", 201),
         ("user_admin", 201),
@@ -63,6 +331,67 @@ class TestAd:
             assert response.data["price"] == ad_data["price"]
             assert response.data["description"] == ad_data["description"]
 
+    @pytest.mark.parametrize("auth_user, expected_status", [
+        ("user_client", 201),
+        ("user_admin", 201),
+        ("anonymous_user", 401)
+    ])
+    def test_ad_bulk_create(self, request, api_client, auth_user, expected_status):
+        """
+        Тестирование пакетного создания объявлений
+        [POST] http://127.0.0.1:8000/ads/bulk/
+        """
+        if auth_user == "anonymous_user":
+            client = api_client
+        else:
+            user = request.getfixturevalue(auth_user)
+            api_client.force_authenticate(user=user)
+            client = api_client
+        ads_data = [{
+            "title": fake.sentence(nb_words=4),
+            "price": fake.random_int(min=100, max=10000),
+            "description": fake.text(),
+        } for _ in range(3)]
+        response = client.post(reverse('ads:ad_bulk_create'), data=ads_data, format='json')
+        assert response.status_code == expected_status
+        if response.status_code == 201:
+            assert [ad["title"] for ad in response.data] == [ad["title"] for ad in ads_data]
+            assert Ad.objects.filter(author=user, pk__in=[ad["id"] for ad in response.data]).count() == 3
+
+    def test_ad_bulk_create_single_insert(self, api_client, user_client, django_assert_num_queries):
+        """Тестирование сохранения пакета объявлений одним запросом INSERT"""
+        api_client.force_authenticate(user=user_client)
+        ads_data = [{"title": f"Объявление {i}", "price": 100, "description": "Описание"} for i in range(50)]
+        with django_assert_num_queries(3):  # SAVEPOINT, INSERT, RELEASE SAVEPOINT
+            response = api_client.post(reverse('ads:ad_bulk_create'), data=ads_data, format='json')
+        assert response.status_code == 201
+        assert Ad.objects.count() == 50
+
+    def test_ad_bulk_create_too_large(self, monkeypatch, api_client, user_client):
+        """Тестирование пакета больше max_body_size: отклоняется до разбора тела"""
+        api_client.force_authenticate(user=user_client)
+        monkeypatch.setattr('callboard.views.AdBulkCreateAPIView.max_body_size', 100)
+        ads_data = [{"title": f"Объявление {i}", "price": 100, "description": "Описание"} for i in range(3)]
+        response = api_client.post(reverse('ads:ad_bulk_create'), data=ads_data, format='json')
+        assert response.status_code == 413
+        assert Ad.objects.count() == 0
+
+    @pytest.mark.parametrize("ads_data", [
+        [{"title": "Объявление", "price": 100, "description": "Описание"},
+         {"title": "Объявление", "price": "дорого", "description": "Описание"}],
+        [],
+        {"title": "Объявление", "price": 100, "description": "Описание"},
+    ])
+    def test_ad_bulk_create_invalid(self, api_client, user_client, ads_data):
+        """Тестирование пакетного создания объявлений с ошибками: ничего не сохраняется"""
+        api_client.force_authenticate(user=user_client)
+        response = api_client.post(reverse('ads:ad_bulk_create'), data=ads_data, format='json')
+        assert response.status_code == 400
+        assert Ad.objects.count() == 0
+        if isinstance(response.data, list):
+            assert response.data[0] == {}
+            assert 'price' in response.data[1]
+
     @pytest.mark.parametrize("auth_user, expected_status", [
         ("user_admin", 200),
         ("user_client", 200),
@@ -82,6 +411,71 @@ class TestAd:
         response = client.get(reverse('ads:ad_detail', kwargs={"pk": ads_user[1].pk}))
         assert response.status_code == expected_status
 
+    def test_ad_detail_reviews(self, api_client, user_client, ad_with_reviews):
+        """
+        Тестирование последних отзывов в объявлении и перехода к следующей странице отзывов
+        [GET] http://127.0.0.1:8000/ads/detail/{int:pk}/
+        """
+        api_client.force_authenticate(user=user_client)
+        expected = list(Review.objects.filter(ad=ad_with_reviews).order_by('-created_at', '-id')
+                        .values_list('pk', flat=True))
+        response = api_client.get(reverse('ads:ad_detail', kwargs={"pk": ad_with_reviews.pk}))
+        assert response.status_code == 200
+        assert response.data['review_count'] == len(expected)
+        assert [review['id'] for review in response.data['review_list']] == expected[:5]
+
+        response = api_client.get(response.data['review_next'])
+        assert response.status_code == 200
+        assert [review['id'] for review in response.data['results']] == expected[5:]
+        assert response.data['next'] is None
+
+    @pytest.mark.parametrize('params, expected_fields, review_queries', [
+        ({'fields': 'id,title,price'}, ['id', 'title', 'price'], 0),
+        ({'omit': 'review_list,review_next'}, ['id', 'title', 'price', 'description', 'created_at', 'updated_at',
+                                               'review_count', 'last_review_at', 'author'], 0),
+        ({'fields': 'id,review_next'}, ['id', 'review_next'], 1),
+        ({'fields': 'review_list'}, ['review_list'], 1),
+    ])
+    def test_ad_detail_sparse_fields(self, api_client, user_client, ad_with_reviews, params, expected_fields,
+                                     review_queries):
+        """Тестирование выборочных полей объявления: отзывы читаются, только если запрошены"""
+        api_client.force_authenticate(user=user_client)
+        url = reverse('ads:ad_detail', kwargs={"pk": ad_with_reviews.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = api_client.get(url, data=params)
+        assert response.status_code == 200
+        assert list(response.data) == expected_fields
+        assert len([query for query in queries if query['sql'].startswith(
+            'SELECT "callboard_review"')]) == review_queries
+        if 'review_next' in expected_fields:
+            assert response.data['review_next'] == api_client.get(url).data['review_next']
+
+    def test_ad_detail_conditional_get(self, api_client, user_client, ad_user, review_ad_create):
+        """Тестирование условного GET просмотра объявления"""
+        api_client.force_authenticate(user=user_client)
+        url = reverse('ads:ad_detail', kwargs={"pk": ad_user.pk})
+        response = api_client.get(url)
+        etag = response.headers['ETag']
+
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+        assert response.content == b''
+        response = api_client.get(url, HTTP_IF_MODIFIED_SINCE=response.headers['Last-Modified'])
+        assert response.status_code == 304
+
+        review_ad_create(user_client, ad_user)
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response.headers['ETag'] != etag
+
+    def test_ad_detail_without_reviews(self, api_client, user_client, ad_user):
+        """Тестирование просмотра объявления без отзывов"""
+        api_client.force_authenticate(user=user_client)
+        response = api_client.get(reverse('ads:ad_detail', kwargs={"pk": ad_user.pk}))
+        assert response.data['review_list'] == []
+        assert response.data['review_count'] == 0
+        assert response.data['review_next'] is None
+
     @pytest.mark.parametrize("auth_user, user_ad, expected_status", [
         ("user_client", "ad_user", 200),
         ("user_client", "ad_admin", 403),
@@ -139,6 +533,108 @@ class TestAd:
         response = client.delete(reverse('ads:ad_delete', kwargs={"pk": ad.pk}))
         assert response.status_code == expected_status
 
+    @pytest.mark.parametrize("method, data, expected_queries", [
+        ("patch", {"description": "Новое описание"}, 2),
+        ("put", {"title": "Новое название", "price": 100, "description": "Новое описание"}, 2),
+    ])
+    def test_ad_update_queries(self, api_client, user_client, ad_user, method, data, expected_queries,
+                               django_assert_num_queries):
+        """Тестирование количества запросов при изменении объявления: автор не загружается"""
+        api_client.force_authenticate(user=user_client)
+        with django_assert_num_queries(expected_queries):
+            response = getattr(api_client, method)(reverse('ads:ad_update', kwargs={"pk": ad_user.pk}), data=data)
+        assert response.status_code == 200
+        ad_user.refresh_from_db()
+        assert ad_user.description == "Новое описание"
+        assert ad_user.updated_at > ad_user.created_at
+
+    def test_ad_destroy_queries(self, api_client, user_client, ad_with_reviews, django_assert_num_queries):
+        """Тестирование количества запросов при удалении объявления: объявление, его отзывы и проверка прав"""
+        api_client.force_authenticate(user=user_client)
+        with django_assert_num_queries(3):
+            response = api_client.delete(reverse('ads:ad_delete', kwargs={"pk": ad_with_reviews.pk}))
+        assert response.status_code == 204
+
+    def test_ad_update_forbidden_queries(self, api_client, user_client2, ad_user, django_assert_num_queries):
+        """Тестирование отказа в изменении чужого объявления одним запросом"""
+        api_client.force_authenticate(user=user_client2)
+        with django_assert_num_queries(1):
+            response = api_client.patch(reverse('ads:ad_update', kwargs={"pk": ad_user.pk}),
+                                        data={"description": "Новое описание"})
+        assert response.status_code == 403
+
+
+@pytest.mark.django_db
+class TestAdAsync:
+    """Тестирование асинхронных эндпоинтов объявлений"""
+
+    def async_get(self, url, user=None, **data):
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'} if user else {}
+        return async_to_sync(AsyncClient().get)(url, data=data, headers=headers)
+
+    def test_ad_list_async(self, api_client, ads_users):
+        """
+        Тестирование асинхронной ленты объявлений: ответ совпадает с синхронным эндпоинтом
+        [GET] http://127.0.0.1:8000/ads/async/
+        """
+        async_url = reverse('ads:ad_list_async')
+        response = self.async_get(async_url, page_size=3)
+        assert response.status_code == 200
+        data = response.json()
+        expected = api_client.get(reverse('ads:ad_list'), data={'page_size': 3}).json()
+        assert data['results'] == expected['results']
+        assert data['next'] == expected['next'].replace(reverse('ads:ad_list'), async_url)
+
+        next_page = self.async_get(data['next']).json()
+        expected_next_page = api_client.get(expected['next']).json()
+        assert next_page['results'] == expected_next_page['results']
+
+    def test_ad_list_async_invalid(self, user_client):
+        """Тестирование асинхронной ленты объявлений с неверным курсором и токеном"""
+        assert self.async_get(reverse('ads:ad_list_async'), cursor='bad').status_code == 404
+        response = async_to_sync(AsyncClient().get)(reverse('ads:ad_list_async'),
+                                                    headers={'Authorization': 'Bearer bad'})
+        assert response.status_code == 401
+        assert response['WWW-Authenticate'] == 'Bearer realm="api"'
+
+    @pytest.mark.parametrize("params", [
+        {'search': 'фото'},
+        {'search_mode': 'trigram'},
+        {'pagination': 'page'},
+        {'fields': 'id,title'},
+        {'omit': 'description'},
+    ])
+    def test_ad_list_async_unsupported_params(self, params):
+        """Тестирование параметров синхронного списка в асинхронной ленте: отклоняются, а не игнорируются"""
+        response = self.async_get(reverse('ads:ad_list_async'), **params)
+        assert response.status_code == 400
+        assert list(response.json()) == list(params)
+
+    def test_ad_detail_async(self, api_client, user_client, ad_with_reviews):
+        """
+        Тестирование асинхронного просмотра объявления: ответ совпадает с синхронным эндпоинтом
+        [GET] http://127.0.0.1:8000/ads/async/detail/{int:pk}/
+        """
+        response = self.async_get(reverse('ads:ad_detail_async', kwargs={'pk': ad_with_reviews.pk}), user_client)
+        assert response.status_code == 200
+        api_client.force_authenticate(user=user_client)
+        expected = api_client.get(reverse('ads:ad_detail', kwargs={'pk': ad_with_reviews.pk}))
+        assert response.content == expected.content
+
+    @pytest.mark.parametrize("auth_user, pk, expected_status", [
+        ("anonymous_user", "ad", 401),
+        ("user_client", 0, 404),
+    ])
+    def test_ad_detail_async_errors(self, request, api_client, ad_user, auth_user, pk, expected_status):
+        """Тестирование ошибок асинхронного просмотра объявления: совпадают с синхронным эндпоинтом"""
+        user = None if auth_user == "anonymous_user" else request.getfixturevalue(auth_user)
+        pk = ad_user.pk if pk == "ad" else pk
+        response = self.async_get(reverse('ads:ad_detail_async', kwargs={'pk': pk}), user)
+        assert response.status_code == expected_status
+        if user:
+            api_client.force_authenticate(user=user)
+        assert response.json() == api_client.get(reverse('ads:ad_detail', kwargs={'pk': pk})).json()
+
 
 @pytest.mark.django_db
 class TestReview:
@@ -223,6 +719,23 @@ class TestReview:
         response = client.get(reverse('ads:review-list'), data={'ad_id': ad_id})
         assert response.status_code == expected_status
 
+    def test_review_sparse_fields(self, api_client, user_client, ad_with_reviews):
+        """Тестирование выборочных полей списка и просмотра отзывов"""
+        api_client.force_authenticate(user=user_client)
+        response = api_client.get(reverse('ads:review-list'), data={
+            'ad_id': ad_with_reviews.pk, 'fields': 'id,text', 'page_size': 2})
+        assert response.status_code == 200
+        assert all(list(review) == ['id', 'text'] for review in response.data['results'])
+        next_page = api_client.get(response.data['next']).data['results']
+        assert [list(review) for review in next_page] == [['id', 'text']] * 2
+
+        review = Review.objects.filter(ad=ad_with_reviews).first()
+        response = api_client.get(reverse('ads:review-detail', kwargs={'pk': review.pk}), data={'omit': 'text'})
+        assert response.status_code == 200
+        assert response.data == {'id': review.pk, 'created_at': response.data['created_at'],
+                                 'updated_at': response.data['updated_at'], 'author': review.author_id,
+                                 'ad': review.ad_id}
+
     @pytest.mark.parametrize("auth_user, review_ad, expected_status", [
         ("user_client", "review_user_ad", 204),
         ("user_client", "review_admin_ad", 403),
@@ -276,6 +789,75 @@ class TestReview:
             review.refresh_from_db()
             assert review.text == new_text
 
+    @pytest.mark.parametrize("method, target_ad, expected_queries", [
+        # SELECT отзыва, SELECT id объявления, SAVEPOINT, UPDATE, RELEASE SAVEPOINT
+        ("put", "ad_user", 5),
+        # ... и пересчет счетчиков обоих объявлений при переносе отзыва
+        ("put", "ad_admin", 6),
+        # SELECT отзыва, SAVEPOINT, DELETE, UPDATE счетчиков, RELEASE SAVEPOINT
+        ("delete", None, 5),
+    ])
+    def test_review_write_queries(self, request, api_client, user_client, review_user_ad, ad_user, method,
+                                  target_ad, expected_queries, django_assert_num_queries):
+        """Тестирование количества запросов при изменении и удалении отзыва: автор не загружается"""
+        api_client.force_authenticate(user=user_client)
+        data = {"text": "Новый текст", "ad": request.getfixturevalue(target_ad).pk} if target_ad else None
+        with django_assert_num_queries(expected_queries):
+            response = getattr(api_client, method)(reverse('ads:review-detail', kwargs={"pk": review_user_ad.pk}),
+                                                   data=data, format='json')
+        assert response.status_code in (200, 204)
+
+    def test_review_create_queries(self, api_client, user_client, ad_user, django_assert_num_queries):
+        """Тестирование количества запросов при создании отзыва"""
+        api_client.force_authenticate(user=user_client)
+        # SELECT id объявления, SAVEPOINT, INSERT, UPDATE счетчиков, RELEASE SAVEPOINT
+        with django_assert_num_queries(5):
+            response = api_client.post(reverse('ads:review-list'), data={"ad": ad_user.pk, "text": "Отзыв"},
+                                       format='json')
+        assert response.status_code == 201
+
+    def test_review_counters(self, api_client, user_client, ad_user, ad_admin):
+        """Тестирование счетчиков отзывов объявления при создании, переносе и удалении отзывов"""
+        api_client.force_authenticate(user=user_client)
+        for _ in range(2):
+            response = api_client.post(reverse('ads:review-list'), data={"ad": ad_user.pk, "text": fake.text()},
+                                       format='json')
+            assert response.status_code == 201
+        ad_user.refresh_from_db()
+        last_review = Review.objects.filter(ad=ad_user).latest('created_at')
+        assert ad_user.review_count == 2
+        assert ad_user.last_review_at == last_review.created_at
+
+        response = api_client.put(reverse('ads:review-detail', kwargs={"pk": last_review.pk}),
+                                  data={"ad": ad_admin.pk, "text": fake.text()}, format='json')
+        assert response.status_code == 200
+        ad_user.refresh_from_db()
+        ad_admin.refresh_from_db()
+        assert ad_user.review_count == 1
+        assert ad_admin.review_count == 1
+        assert ad_admin.last_review_at == last_review.created_at
+
+        first_review = Review.objects.get(ad=ad_user)
+        response = api_client.delete(reverse('ads:review-detail', kwargs={"pk": first_review.pk}))
+        assert response.status_code == 204
+        ad_user.refresh_from_db()
+        assert ad_user.review_count == 0
+        assert ad_user.last_review_at is None
+
+    def test_review_list_conditional_get(self, api_client, user_client, ad_with_reviews, django_assert_num_queries):
+        """Тестирование условного GET списка комментариев"""
+        api_client.force_authenticate(user=user_client)
+        url = reverse('ads:review-list')
+        etag = api_client.get(url, data={'ad_id': ad_with_reviews.pk}).headers['ETag']
+        with django_assert_num_queries(1):
+            response = api_client.get(url, data={'ad_id': ad_with_reviews.pk}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        Review.objects.filter(ad=ad_with_reviews).first().delete()
+        response = api_client.get(url, data={'ad_id': ad_with_reviews.pk}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert 'Last-Modified' not in response.headers
+
     @pytest.mark.parametrize("auth_user, expected_status", [
         ("user_client", 400),
         ("user_admin", 400),
@@ -305,6 +887,105 @@ class TestCallboardModels:
         ad = Ad.objects.get(pk=ad_user.pk)
         assert str(ad) == ad_user.title
 
+    def test_rebuild_ad_counters(self, ad_with_reviews, ad_user):
+        """Тестирование команды пересчета счетчиков отзывов"""
+        Ad.objects.update(review_count=0, last_review_at=None)
+        call_command('rebuild_ad_counters', batch_size=1)
+        ad_with_reviews.refresh_from_db()
+        ad_user.refresh_from_db()
+        reviews = Review.objects.filter(ad=ad_with_reviews)
+        assert ad_with_reviews.review_count == reviews.count()
+        assert ad_with_reviews.last_review_at == reviews.latest('created_at').created_at
+        assert ad_user.review_count == 0
+        assert ad_user.last_review_at is None
+
+    def test_import_ads_csv(self, tmp_path, user_client):
+        """Тестирование загрузки объявлений из CSV файла"""
+        path = tmp_path / 'ads.csv'
+        path.write_text(
+            'title,price,description,author_email,created_at\n'
+            f'Велосипед,1000,"Горный, почти новый",{user_client.email},2024-05-01T10:00:00Z\n'
+            f'Самокат,500,Детский,{user_client.email},\n',
+            encoding='utf-8',
+        )
+        call_command('import_callboard', 'ad', str(path), batch_size=1)
+        ads = {ad.title: ad for ad in Ad.objects.filter(author=user_client)}
+        assert ads['Велосипед'].description == 'Горный, почти новый'
+        assert ads['Велосипед'].created_at.isoformat() == '2024-05-01T10:00:00+00:00'
+        assert ads['Самокат'].created_at is not None
+        assert ads['Самокат'].review_count == 0
+
+    def test_import_reviews_jsonl(self, tmp_path, ad_user, user_client):
+        """Тестирование загрузки отзывов из JSONL файла с пересчетом счетчиков"""
+        path = tmp_path / 'reviews.jsonl'
+        path.write_text(
+            f'{{"text": "Отличный товар", "ad": {ad_user.pk}, "author_email": "{user_client.email}"}}\n\n'
+            f'{{"text": "Не понравилось", "ad": {ad_user.pk}, "author_email": "{user_client.email}"}}\n',
+            encoding='utf-8',
+        )
+        call_command('import_callboard', 'review', str(path))
+        ad_user.refresh_from_db()
+        assert ad_user.review_count == 2
+        assert ad_user.last_review_at == Review.objects.filter(ad=ad_user).latest('created_at').created_at
+
+    @pytest.mark.parametrize("line", [
+        '{"text": "Отзыв", "ad": %(ad)s, "author_email": "unknown@example.com"}',
+        '{"text": "Отзыв", "ad": "abc", "author_email": "%(email)s"}',
+        '{"text": "Отзыв", "ad": 0, "author_email": "%(email)s"}',
+        '{"text": "", "ad": %(ad)s, "author_email": "%(email)s"}',
+        '{"text": "Отзыв"',
+    ])
+    def test_import_invalid(self, tmp_path, ad_user, user_client, line):
+        """Тестирование загрузки файла с ошибкой: ничего не сохраняется"""
+        path = tmp_path / 'reviews.jsonl'
+        valid = '{"text": "Отзыв", "ad": %(ad)s, "author_email": "%(email)s"}'
+        path.write_text(f'{valid}\n{line}\n' % {'ad': ad_user.pk, 'email': user_client.email}, encoding='utf-8')
+        with pytest.raises(CommandError):
+            call_command('import_callboard', 'review', str(path))
+        assert not Review.objects.exists()
+
+    def test_import_without_copy(self, tmp_path, monkeypatch, user_client):
+        """Тестирование загрузки без COPY на бэкендах, отличных от PostgreSQL"""
+        monkeypatch.setattr('callboard.bulk.can_copy', lambda: False)
+        path = tmp_path / 'ads.jsonl'
+        path.write_text(
+            f'{{"title": "Велосипед", "price": 1000, "description": "Описание", '
+            f'"author_email": "{user_client.email}", "created_at": "2024-05-01T10:00:00Z"}}\n',
+            encoding='utf-8',
+        )
+        call_command('import_callboard', 'ad', str(path))
+        ad = Ad.objects.get(author=user_client)
+        assert ad.title == 'Велосипед'
+        assert ad.created_at.isoformat() == '2024-05-01T10:00:00+00:00'
+
+    @pytest.mark.parametrize("copy, keep_indexes", [
+        (True, False),
+        (False, True),
+    ], ids=['copy', 'insert'])
+    def test_generate_data(self, monkeypatch, user_client, copy, keep_indexes):
+        """Тестирование генерации данных: счетчики отзывов совпадают с отзывами, ключи и индексы на месте"""
+        monkeypatch.setattr('callboard.bulk.can_copy', lambda: copy)
+        call_command('generate_data', users=5, ads=20, reviews=60, batch_size=7, seed=1, keep_indexes=keep_indexes)
+        users = User.objects.filter(email__endswith='@generated.local')
+        assert users.count() == 5
+        assert users.first().check_password('password')
+        ads = Ad.objects.filter(author__in=users).annotate(total=Count('review'), last=Max('review__created_at'))
+        assert ads.count() == 20
+        assert Review.objects.filter(ad__in=ads).count() == 60
+        for ad in ads:
+            assert (ad.review_count, ad.last_review_at) == (ad.total, ad.last)
+        assert Ad.objects.create(title='Велосипед', price=100, description='Описание', author=user_client).pk
+        with pytest.raises(IntegrityError), transaction.atomic():
+            Review.objects.create(text='Отзыв', ad_id=0, author=user_client)
+            connection.check_constraints(table_names=[Review._meta.db_table])
+
+    def test_copy_text_escaping(self):
+        """Тестирование экранирования значений текстового формата COPY и обратного разбора строки"""
+        value = 'путь\\к\tфайлу\nи\rстрока'
+        line = f'{escape_copy_value(value)}\t{COPY_NULL}\t\\N.\n'
+        assert '\n' not in line[:-1] and line.count('\t') == 2
+        assert decode_copy_line(line) == [value, None, 'N.']
+
     def test_review_model_str(self, review_user_ad):
         """Тестирование метода str у модели Review"""
         ad = Review.objects.get(pk=review_user_ad.pk)
@@ -0,0 +1,154 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from callboard.generator import TITLE_ADJECTIVES, TITLE_WORDS
+from callboard.models import Ad, Review
+from callboard.paginators import AdCursorPagination, ReviewCursorPagination
+from users.models import User
+
+FORBIDDEN_NODES = {'Seq Scan', 'Sort', 'Incremental Sort'}
+
+
+def plan_nodes(plan):
+    """Обходит все узлы плана запроса"""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        result = cursor.fetchone()[0]
+    return (json.loads(result) if isinstance(result, str) else result)[0]['Plan']
+
+
+@pytest.fixture
+def seeded_callboard():
+    """Фикстура заполнения базы объемом данных, при котором планировщик выбирает индексы"""
+    now = timezone.now()
+    users = User.objects.bulk_create(
+        User(email=f'plan{i}@example.com', password='!', first_name='Plan', last_name=str(i), phone='')
+        for i in range(100)
+    )
+    admin = User.objects.create(email='plan-admin@example.com', password='!', is_staff=True, is_superuser=True)
+    ads = Ad.objects.bulk_create(
+        Ad(title=f'{TITLE_ADJECTIVES[i % 10]} {TITLE_WORDS[i // 10 % 16]} {i}', price=100 + i,
+           description=f'Описание объявления номер {i}',
+           author=users[i % len(users)])
+        for i in range(10000)
+    )
+    Review.objects.bulk_create(
+        # Глубокие страницы отзывов бывают у популярных объявлений, поэтому у первого их больше остальных
+        Review(text=f'Отзыв {i}', ad=ads[0] if i % 20 == 0 else ads[i % len(ads)], author=users[i % len(users)])
+        for i in range(10000)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute("UPDATE callboard_ad SET created_at = %s - id * interval '1 minute'", [now])
+        cursor.execute("UPDATE callboard_review SET created_at = %s - id * interval '1 second'", [now])
+        cursor.execute('ANALYZE users_user')
+        cursor.execute('ANALYZE callboard_ad')
+        cursor.execute('ANALYZE callboard_review')
+    return {'ad': ads[0], 'author': users[0], 'deleted_author': users[1], 'admin': admin,
+            'middle_ad': Ad.objects.order_by('-created_at', '-id')[5000]}
+
+
+def get(data, url_name, params=None, **kwargs):
+    client = APIClient()
+    client.force_authenticate(user=data['author'])
+    response = client.get(reverse(url_name, kwargs=kwargs), data=params)
+    assert response.status_code == 200, response.data
+
+
+def feed_first_page(data):
+    get(data, 'ads:ad_list')
+
+
+def feed_first_page_without_shared_cache(data):
+    # Без общего кэша ETag считается по выбранной странице, а не агрегатом по всей таблице
+    with override_settings(SHARED_CACHE=False):
+        get(data, 'ads:ad_list')
+
+
+def feed_deep_page(data):
+    get(data, 'ads:ad_list', {'cursor': AdCursorPagination().encode_cursor(data['middle_ad'])})
+
+
+def ad_detail(data):
+    get(data, 'ads:ad_detail', pk=data['ad'].pk)
+
+
+def reviews_by_ad(data):
+    get(data, 'ads:review-list', {'ad_id': data['ad'].pk})
+
+
+def reviews_deep_page(data):
+    review = Review.objects.filter(ad=data['ad']).order_by('-created_at', '-id')[10]
+    get(data, 'ads:review-list', {'ad_id': data['ad'].pk,
+                                  'cursor': ReviewCursorPagination().encode_cursor(review)})
+
+
+def user_delete(data):
+    # Каскадное удаление объявлений и отзывов автора идет по составным индексам с автором в начале
+    client = APIClient()
+    client.force_authenticate(user=data['admin'])
+    assert client.delete(reverse('users:user_delete', kwargs={'pk': data['deleted_author'].pk})).status_code == 204
+
+
+def title_autocomplete(data):
+    get(data, 'ads:ad_autocomplete', {'q': 'игровой фото'})
+
+
+def full_text_search(data):
+    get(data, 'ads:ad_list', {'search': '1234'})
+
+
+def trigram_search(data):
+    get(data, 'ads:ad_list', {'search': 'игравой фотоапарат', 'search_mode': 'trigram'})
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+    """Тестирование планов горячих запросов: без последовательного сканирования и явной сортировки"""
+
+    def assert_plans(self, hot_query, data, forbidden_nodes):
+        with CaptureQueriesContext(connection) as context:
+            hot_query(data)
+        # Проверяются запросы к таблицам объявлений и отзывов, которые выполнил сам эндпоинт
+        queries = [query for query in context.captured_queries if 'callboard_' in query['sql']]
+        assert queries
+        for query in queries:
+            plan = explain(query['sql'])
+            node_types = {node['Node Type'] for node in plan_nodes(plan)}
+            assert not node_types & forbidden_nodes, f"{query['sql']}\n{json.dumps(plan, indent=2)}"
+
+    @pytest.mark.parametrize("hot_query", [
+        feed_first_page,
+        feed_first_page_without_shared_cache,
+        feed_deep_page,
+        ad_detail,
+        reviews_by_ad,
+        reviews_deep_page,
+        title_autocomplete,
+    ], ids=lambda hot_query: hot_query.__name__)
+    def test_hot_query_plan(self, seeded_callboard, hot_query):
+        self.assert_plans(hot_query, seeded_callboard, FORBIDDEN_NODES)
+
+    @pytest.mark.parametrize("hot_query", [
+        full_text_search,
+        trigram_search,
+        user_delete,
+    ], ids=lambda hot_query: hot_query.__name__)
+    def test_index_only_query_plan(self, seeded_callboard, hot_query):
+        """
+        Результаты поиска сортируются по релевантности, а каскадное удаление - по Meta.ordering,
+        поэтому проверяется только использование индекса
+        """
+        self.assert_plans(hot_query, seeded_callboard, {'Seq Scan'})
@@ -1,37 +1,51 @@
 import factory
 import pytest
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 from faker import Faker
 from rest_framework.test import APIClient
 
 from callboard.models import Ad, Review
+from callboard.services import review_added
 from users.models import User
 
 fake = Faker()
 
+# Хеш пароля считается один раз: set_password на каждого пользователя проходит полный цикл PBKDF2
+PASSWORD_HASH = make_password('password')
+
 
 class UserFactory(factory.django.DjangoModelFactory):
     """Фабрика создания пользователей"""
 
     class Meta:
         model = User
-        skip_postgeneration_save = True
 
     first_name = factory.Faker("first_name")
     last_name = factory.Faker("last_name")
     phone = factory.LazyAttribute(lambda x: fake.phone_number()[:15])
     email = factory.Faker("email")
-    password = factory.PostGenerationMethodCall("set_password", "password")
+    password = PASSWORD_HASH
     is_active = True
     is_staff = False
     is_superuser = False
 
-    @factory.post_generation
-    def save_user(self, create, extracted, **kwargs):
-        if create:
-            self.save()
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Фикстура очистки кэша между тестами"""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def shared_cache(settings):
+    """Фикстура общего кэша: тесты идут в одном процессе, поэтому LocMemCache для них общий"""
+    settings.SHARED_CACHE = True
 
 
 @pytest.fixture
@@ -155,6 +169,11 @@ class ReviewFactory(factory.django.DjangoModelFactory):
     author = factory.SubFactory(UserFactory)
     ad = factory.SubFactory(AdFactory)
 
+    @factory.post_generation
+    def update_ad_counters(self, create, extracted, **kwargs):
+        if create:
+            review_added(self)
+
 
 @pytest.fixture
 def review_ad_create():
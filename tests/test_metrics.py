@@ -0,0 +1,129 @@
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from prometheus_client.parser import text_string_to_metric_families
+from rest_framework.test import APIClient
+
+from config.middleware import MetricsMiddleware, permanent_execute_wrappers
+from config.slow_queries import logger
+
+# Процесс воркера: пишет метрики в общий каталог так же, как воркер gunicorn
+WORKER = """
+import django
+django.setup()
+from config.metrics import REQUESTS
+REQUESTS.labels('ads:ad_list', 'GET', 200).inc()
+"""
+
+
+def get_samples(content):
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(content.decode())
+        for sample in family.samples
+    }
+
+
+@pytest.mark.django_db
+class TestMetrics:
+    """Тестирование метрик Prometheus"""
+
+    def test_request_metrics(self, api_client, ads_users):
+        """Тестирование метрик запроса с меткой по имени маршрута"""
+        labels = {'view': 'ads:ad_list', 'method': 'GET'}
+        before = REGISTRY.get_sample_value('http_requests_total', {**labels, 'status': '200'}) or 0
+        queries_before = REGISTRY.get_sample_value('http_request_db_queries_count', labels) or 0
+        assert api_client.get(reverse('ads:ad_list'), data={'pagination': 'page'}).status_code == 200
+
+        response = api_client.get(reverse('metrics'))
+        assert response.status_code == 200
+        assert response['Content-Type'].startswith('text/plain')
+        samples = get_samples(response.content)
+        key = tuple(sorted({**labels, 'status': '200'}.items()))
+        assert samples[('http_requests_total', key)] == before + 1
+        assert samples[('http_request_db_queries_count', tuple(sorted(labels.items())))] == queries_before + 1
+        assert samples[('http_request_db_queries_sum', tuple(sorted(labels.items())))] > 0
+        assert samples[('http_response_size_bytes_count', tuple(sorted(labels.items())))] > 0
+
+    def test_unresolved_view(self, api_client):
+        """Тестирование метки для запросов без маршрута: путь в метку не попадает"""
+        labels = {'view': '<unresolved>', 'method': 'GET', 'status': '404'}
+        before = REGISTRY.get_sample_value('http_requests_total', labels) or 0
+        assert api_client.get('/missing/12345/').status_code == 404
+        assert REGISTRY.get_sample_value('http_requests_total', labels) == before + 1
+
+    def test_multiprocess(self, api_client, monkeypatch, tmp_path):
+        """Тестирование сложения метрик нескольких процессов через общий каталог"""
+        for _ in range(2):
+            subprocess.run([sys.executable, '-c', WORKER], check=True,
+                           env={**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(tmp_path)})
+        monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+        samples = get_samples(api_client.get(reverse('metrics')).content)
+        key = tuple(sorted({'view': 'ads:ad_list', 'method': 'GET', 'status': '200'}.items()))
+        assert samples[('http_requests_total', key)] == 2
+
+    def test_async_request_metrics(self, ads_users):
+        """Тестирование метрик асинхронного эндпоинта: middleware работает в асинхронной цепочке"""
+        async def get_response(request):
+            return HttpResponse()
+
+        assert iscoroutinefunction(MetricsMiddleware(get_response))
+        labels = {'view': 'ads:ad_list_async', 'method': 'GET'}
+        before = REGISTRY.get_sample_value('http_requests_total', {**labels, 'status': '200'}) or 0
+        queries_before = REGISTRY.get_sample_value('http_request_db_queries_sum', labels) or 0
+        assert async_to_sync(AsyncClient().get)(reverse('ads:ad_list_async')).status_code == 200
+        assert REGISTRY.get_sample_value('http_requests_total', {**labels, 'status': '200'}) == before + 1
+        assert REGISTRY.get_sample_value('http_request_db_queries_sum', labels) > queries_before
+
+    def test_metrics_access(self, settings, api_client):
+        """Тестирование доступа к метрикам: только с разрешенных адресов или с токеном"""
+        url = reverse('metrics')
+        assert api_client.get(url, REMOTE_ADDR='203.0.113.5').status_code == 404
+
+        settings.METRICS_ALLOWED_IPS = ['127.0.0.1', '203.0.113.0/24']
+        assert api_client.get(url, REMOTE_ADDR='203.0.113.5').status_code == 200
+        assert api_client.get(url, REMOTE_ADDR='198.51.100.1').status_code == 404
+
+        settings.METRICS_TOKEN = 'secret'
+        assert api_client.get(url, REMOTE_ADDR='198.51.100.1', HTTP_AUTHORIZATION='Bearer secret').status_code == 200
+        assert api_client.get(url, REMOTE_ADDR='198.51.100.1', HTTP_AUTHORIZATION='Bearer wrong').status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_query_counter_on_new_connection(settings, tmp_path):
+    """
+    Тестирование соединения, открытого первым запросом внутри оберток профилирования и журнала
+    (новый поток сервера): обертки запроса снимаются, постоянный счетчик остается
+    """
+    settings.PROFILING_ENABLED = True
+    settings.SLOW_QUERY_LOG_ENABLED = True
+    settings.SLOW_QUERY_LOG_DIR = tmp_path
+    wrappers = []
+
+    def serve():
+        client = APIClient()
+        try:
+            for _ in range(2):
+                assert client.get(reverse('ads:ad_list')).status_code == 200
+                wrappers.append(list(connection.execute_wrappers))
+        finally:
+            connection.close()
+
+    try:
+        thread = threading.Thread(target=serve)
+        thread.start()
+        thread.join()
+    finally:
+        for handler in logger.handlers[:]:
+            handler.close()
+            logger.removeHandler(handler)
+    assert wrappers == [permanent_execute_wrappers] * 2
@@ -0,0 +1,74 @@
+import os
+import pstats
+import re
+import subprocess
+import sys
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+    """Тестирование профилирования запросов"""
+
+    def test_disabled(self, ads_users):
+        """Тестирование выключенного профилирования: заголовок не добавляется"""
+        response = APIClient().get(reverse('ads:ad_list'))
+        assert response.status_code == 200
+        assert 'Server-Timing' not in response.headers
+
+    def test_server_timing(self, settings, ads_users):
+        """Тестирование заголовка Server-Timing с временем SQL, сериализации и рендеринга"""
+        settings.PROFILING_ENABLED = True
+        response = APIClient().get(reverse('ads:ad_list'), data={'pagination': 'page'})
+        assert response.status_code == 200
+        metrics = dict(re.findall(r'(\w+);dur=([\d.]+)', response.headers['Server-Timing']))
+        assert set(metrics) == {'sql', 'serialize', 'render', 'total'}
+        assert float(metrics['serialize']) > 0
+        assert float(metrics['render']) > 0
+        assert float(metrics['total']) >= float(metrics['sql'])
+        assert re.search(r'sql;dur=[\d.]+;desc="[1-9]\d* queries"', response.headers['Server-Timing'])
+
+    def test_async_server_timing(self, settings, tmp_path, ads_users):
+        """
+        Тестирование асинхронного эндпоинта: SQL через sync_to_async попадает в замеры,
+        а cProfile в цикле событий не включается
+        """
+        settings.PROFILING_ENABLED = True
+        settings.PROFILING_SAMPLE_RATE = 1
+        settings.PROFILING_DIR = tmp_path
+        response = async_to_sync(AsyncClient().get)(reverse('ads:ad_list_async'))
+        assert response.status_code == 200
+        assert re.search(r'sql;dur=[\d.]+;desc="[1-9]\d* queries"', response.headers['Server-Timing'])
+        assert not list(tmp_path.iterdir())
+
+    def test_profile_dump(self, settings, tmp_path, ads_users):
+        """Тестирование сохранения дампа cProfile для выбранного запроса"""
+        settings.PROFILING_ENABLED = True
+        settings.PROFILING_SAMPLE_RATE = 1
+        settings.PROFILING_DIR = tmp_path
+        assert APIClient().get(reverse('ads:ad_list')).status_code == 200
+        dump, = tmp_path.iterdir()
+        assert re.fullmatch(r'\d+-GET-ads\.ad_list-\d+ms\.prof', dump.name)
+        assert pstats.Stats(str(dump)).total_calls > 0
+
+    def test_empty_env_settings(self):
+        """Тестирование пустых значений из .env.sample: настройки импортируются со значениями по умолчанию"""
+        result = subprocess.run(
+            [sys.executable, '-c', 'from django.conf import settings; print(settings.PROFILING_SAMPLE_RATE)'],
+            check=True, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'config.settings', 'PROFILING_SAMPLE_RATE': ''},
+        )
+        assert result.stdout.strip() == '0.0'
+
+    def test_projections_without_middleware(self):
+        """Тестирование импорта плана полей: замер сериализации не тянет за собой модуль middleware"""
+        code = ('import sys, django; django.setup(); import callboard.projections; '
+                'print("config.middleware" in sys.modules)')
+        result = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True,
+                                env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'config.settings'})
+        assert result.stdout.strip() == 'False'
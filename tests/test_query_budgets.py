@@ -0,0 +1,282 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from callboard import urls as callboard_urls
+from callboard.paginators import ReviewCursorPagination
+from tests.conftest import AdFactory, ReviewFactory, UserFactory
+from users import urls as users_urls
+from users.services import LAST_LOGIN_DUE_KEY
+
+SMALL_SIZE = 2
+LARGE_SIZE = 25
+
+# Корень роутера отзывов совпадает с лентой объявлений и недостижим
+UNREACHABLE_ROUTES = {'ads:api-root'}
+
+
+class Seed:
+    """
+    Данные для замеров: объявления автора и отзывы целевого объявления.
+    Объем наращивается между замерами, количество запросов от него зависеть не должно
+    """
+
+    def __init__(self, author, other, admin):
+        self.author = author
+        self.other = other
+        self.admin = admin
+        self.size = 0
+        self.ad = AdFactory.create(author=author, title='Велосипед горный')
+        self.review = ReviewFactory.create(ad=self.ad, author=author)
+
+    def grow(self, size):
+        AdFactory.create_batch(size - self.size, author=self.author, title='Велосипед детский')
+        ReviewFactory.create_batch(size - self.size, ad=self.ad, author=self.other)
+        self.size = size
+
+    def ad_with_reviews(self):
+        ad = AdFactory.create(author=self.author)
+        ReviewFactory.create_batch(self.size, ad=ad, author=self.other)
+        return ad
+
+    def user_with_ads(self):
+        user = UserFactory.create()
+        for ad in AdFactory.create_batch(self.size, author=user):
+            ReviewFactory.create(ad=ad, author=self.other)
+        return user
+
+    def ads_payload(self):
+        return [{"title": f"Объявление {i}", "price": 100, "description": "Описание"} for i in range(self.size)]
+
+    def reset_password_kwargs(self):
+        # Токен зависит от хеша пароля, который меняется при каждом сбросе
+        self.author.refresh_from_db()
+        return {'uid': urlsafe_base64_encode(force_bytes(self.author.pk)),
+                'token': default_token_generator.make_token(self.author)}
+
+    def reviews_cursor(self):
+        return ReviewCursorPagination().encode_cursor(self.ad.review_set.order_by('-created_at', '-id')[2])
+
+
+def ad_url(name, ad):
+    return reverse(name, kwargs={'pk': ad.pk})
+
+
+def review_url(review):
+    return reverse('ads:review-detail', kwargs={'pk': review.pk})
+
+
+# (маршрут, метод, от чьего имени, бюджет запросов, построитель url и данных запроса)
+CASES = [
+    pytest.param(
+        'ads:ad_list', 'get', 'author', 2,
+        lambda seed: (reverse('ads:ad_list'), {'page_size': 4}),
+        id='ad_list-cursor',
+    ),
+    pytest.param(
+        'ads:ad_list', 'get', 'author', 3,
+        lambda seed: (reverse('ads:ad_list'), {'pagination': 'page', 'page': 2, 'page_size': 2}),
+        id='ad_list-page',
+    ),
+    pytest.param(
+        'ads:ad_list', 'get', 'author', 3,
+        lambda seed: (reverse('ads:ad_list'), {'search': 'велосипед'}),
+        id='ad_list-search',
+    ),
+    pytest.param(
+        'ads:ad_list', 'get', 'author', 3,
+        lambda seed: (reverse('ads:ad_list'), {'search': 'велосипд', 'search_mode': 'trigram'}),
+        id='ad_list-trigram',
+    ),
+    pytest.param(
+        'ads:ad_export', 'get', 'author', 1,
+        lambda seed: (reverse('ads:ad_export'), {}),
+        id='ad_export',
+    ),
+    pytest.param(
+        'ads:ad_export', 'get', 'author', 1,
+        lambda seed: (reverse('ads:ad_export'), {'export_format': 'csv'}),
+        id='ad_export-csv',
+    ),
+    pytest.param(
+        'ads:ad_autocomplete', 'get', 'author', 2,
+        lambda seed: (reverse('ads:ad_autocomplete'), {'q': 'вело'}),
+        id='ad_autocomplete',
+    ),
+    pytest.param(
+        'ads:ad_create', 'post', 'author', 1,
+        lambda seed: (reverse('ads:ad_create'), seed.ads_payload()[0]),
+        id='ad_create',
+    ),
+    pytest.param(
+        'ads:ad_bulk_create', 'post', 'author', 3,
+        lambda seed: (reverse('ads:ad_bulk_create'), seed.ads_payload()),
+        id='ad_bulk_create',
+    ),
+    pytest.param(
+        'ads:ad_detail', 'get', 'author', 3,
+        lambda seed: (ad_url('ads:ad_detail', seed.ad), {}),
+        id='ad_detail',
+    ),
+    pytest.param(
+        'ads:ad_list_async', 'get', None, 1,
+        lambda seed: (reverse('ads:ad_list_async'), {'page_size': 4}),
+        id='ad_list_async',
+    ),
+    pytest.param(
+        'ads:ad_detail_async', 'get', 'author', 3,
+        lambda seed: (ad_url('ads:ad_detail_async', seed.ad), {}),
+        id='ad_detail_async',
+    ),
+    pytest.param(
+        'ads:ad_update', 'patch', 'author', 2,
+        lambda seed: (ad_url('ads:ad_update', seed.ad), {'description': 'Новое описание'}),
+        id='ad_update',
+    ),
+    pytest.param(
+        'ads:ad_delete', 'delete', 'author', 3,
+        lambda seed: (ad_url('ads:ad_delete', seed.ad_with_reviews()), None),
+        id='ad_delete',
+    ),
+    pytest.param(
+        'ads:review-list', 'get', 'author', 2,
+        lambda seed: (reverse('ads:review-list'), {'ad_id': seed.ad.pk, 'page_size': 50}),
+        id='review_list',
+    ),
+    pytest.param(
+        'ads:review-list', 'get', 'author', 2,
+        lambda seed: (reverse('ads:review-list'), {'ad_id': seed.ad.pk, 'cursor': seed.reviews_cursor()}),
+        id='review_list-cursor',
+    ),
+    pytest.param(
+        'ads:review-list', 'post', 'author', 5,
+        lambda seed: (reverse('ads:review-list'), {'ad': seed.ad.pk, 'text': 'Отзыв'}),
+        id='review_create',
+    ),
+    pytest.param(
+        'ads:review-detail', 'get', 'author', 1,
+        lambda seed: (review_url(seed.review), {}),
+        id='review_detail',
+    ),
+    pytest.param(
+        'ads:review-detail', 'put', 'author', 5,
+        lambda seed: (review_url(seed.review), {'ad': seed.ad.pk, 'text': 'Новый текст'}),
+        id='review_update',
+    ),
+    pytest.param(
+        'ads:review-detail', 'patch', 'author', 4,
+        lambda seed: (review_url(seed.review), {'text': 'Новый текст'}),
+        id='review_partial_update',
+    ),
+    pytest.param(
+        'ads:review-detail', 'delete', 'author', 5,
+        lambda seed: (review_url(ReviewFactory.create(ad=seed.ad, author=seed.author)), None),
+        id='review_delete',
+    ),
+    pytest.param(
+        'users:token_obtain_pair', 'post', None, 1,
+        lambda seed: (reverse('users:token_obtain_pair'), {'email': seed.author.email, 'password': 'password'}),
+        id='token_obtain_pair',
+    ),
+    pytest.param(
+        'users:token_refresh', 'post', None, 0,
+        lambda seed: (reverse('users:token_refresh'), {'refresh': str(RefreshToken.for_user(seed.author))}),
+        id='token_refresh',
+    ),
+    pytest.param(
+        'users:user_create', 'post', None, 2,
+        lambda seed: (reverse('users:user_create'), {
+            'first_name': 'Имя', 'last_name': 'Фамилия', 'phone': '+7(000)123-45-67',
+            'email': f'budget{seed.size}@example.com', 'password': 'Qwe123ewQ', 'role': 'user'}),
+        id='user_create',
+    ),
+    pytest.param(
+        'users:user_update', 'patch', 'author', 3,
+        lambda seed: (reverse('users:user_update', kwargs={'pk': seed.author.pk}),
+                      {'first_name': 'Новое имя', 'password': 'Qwe123ewQ'}),
+        id='user_update',
+    ),
+    pytest.param(
+        'users:user_detail', 'get', 'author', 1,
+        lambda seed: (reverse('users:user_detail', kwargs={'pk': seed.author.pk}), {}),
+        id='user_detail',
+    ),
+    pytest.param(
+        'users:user_delete', 'delete', 'admin', 9,
+        lambda seed: (reverse('users:user_delete', kwargs={'pk': seed.user_with_ads().pk}), None),
+        id='user_delete',
+    ),
+    pytest.param(
+        'users:password_reset', 'post', None, 2,
+        lambda seed: (reverse('users:password_reset'), {'email': seed.author.email}),
+        id='password_reset',
+    ),
+    pytest.param(
+        'users:password_reset_confirm', 'post', None, 3,
+        lambda seed: (reverse('users:password_reset_confirm', kwargs=seed.reset_password_kwargs()),
+                      {'new_password': 'new@pass@123'}),
+        id='password_reset_confirm',
+    ),
+]
+
+
+@pytest.mark.django_db
+class TestQueryBudgets:
+    """
+    Тестирование бюджетов SQL-запросов на каждый маршрут.
+    Каждый запрос выполняется на малом и большом объеме данных: количество запросов
+    не должно расти вместе с объемом (N+1) и не должно превышать объявленный бюджет
+    """
+
+    @pytest.fixture(autouse=True)
+    def setup(self, api_client, user_admin, user_client, user_client2):
+        self.api_client = api_client
+        self.seed = Seed(user_client, user_client2, user_admin)
+
+    def count_queries(self, route, method, user, build):
+        url, data = build(self.seed)
+        cache.clear()
+        # Журнал входов сбрасывается не на каждом запросе, поэтому сброс в замеры не попадает
+        cache.add(LAST_LOGIN_DUE_KEY, 1)
+        with CaptureQueriesContext(connection) as context:
+            if route.endswith('_async'):
+                # Асинхронные эндпоинты аутентифицируют сами, снимок пользователя берется из БД
+                headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'} if user else {}
+                response = async_to_sync(AsyncClient().get)(url, data=data, headers=headers)
+            else:
+                response = getattr(self.api_client, method)(url, data=data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        assert response.status_code < 400, response.content
+        return [query['sql'] for query in context.captured_queries]
+
+    @pytest.mark.parametrize("route, method, role, budget, build", CASES)
+    def test_query_budget(self, route, method, role, budget, build):
+        user = getattr(self.seed, role) if role else None
+        self.api_client.force_authenticate(user=user)
+
+        self.seed.grow(SMALL_SIZE)
+        small = self.count_queries(route, method, user, build)
+        self.seed.grow(LARGE_SIZE)
+        large = self.count_queries(route, method, user, build)
+
+        assert len(large) == len(small), 'Количество запросов растет с объемом данных:\n' + '\n'.join(large)
+        assert len(large) <= budget, f'Превышен бюджет {budget}:\n' + '\n'.join(large)
+
+    def test_all_routes_covered(self):
+        """Тестирование полноты набора: каждый маршрут callboard и users имеет бюджет"""
+        routes = {
+            f'{namespace}:{pattern.name}'
+            for namespace, module in (('ads', callboard_urls), ('users', users_urls))
+            for pattern in module.urlpatterns if pattern.name
+        }
+        covered = {case.values[0] for case in CASES}
+        assert routes - UNREACHABLE_ROUTES == covered
@@ -0,0 +1,120 @@
+import io
+import uuid
+from collections import OrderedDict
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from config import parsers, renderers
+from config.parsers import ORJSONParser
+from config.renderers import ORJSONRenderer
+from users.models import User
+
+PAYLOAD = OrderedDict([
+    ('utc', datetime(2024, 5, 1, 12, 30, 0, 123456, tzinfo=timezone.utc)),
+    ('moscow', datetime(2024, 5, 1, 15, 30, tzinfo=timezone(timedelta(hours=3)))),
+    ('naive', datetime(2024, 5, 1, 12, 30)),
+    ('date', date(2024, 5, 1)),
+    ('time', time(12, 30, 15, 500)),
+    ('duration', timedelta(hours=1, seconds=5)),
+    ('price', Decimal('1999.90')),
+    ('uuid', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+    ('role', User.UsersRolesChoices.ADMIN),
+    ('role_label', User.UsersRolesChoices.ADMIN.label),
+    ('text', 'Объявление\u2028с\u2029разделителями "строк"'),
+    ('numbers', [1, -2.5, 2 ** 63, True, None]),
+    ('by_id', {1: 'a', 2: ['b']}),
+    ('tuple', (1, 2)),
+])
+# Без целого больше 64 бит, из-за которого кодирование отдается JSONRenderer, и с числами,
+# которые стандартный json пишет в экспоненциальной записи
+FLOAT_PAYLOAD = OrderedDict([*PAYLOAD.items(), ('numbers', [1, -2.5, 1e16, -1e-7, 1e-5, 1e-4, 0.1, True, None])])
+
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def json_backend(request, monkeypatch):
+    """Фикстура проверки с orjson и без него"""
+    if request.param == 'stdlib':
+        monkeypatch.setattr(renderers, 'orjson', None)
+        monkeypatch.setattr(parsers, 'orjson', None)
+    return request.param
+
+
+class TestJSON:
+    """Тестирование JSON-рендерера и парсера на orjson"""
+
+    @pytest.mark.parametrize('accepted_media_type, renderer_context', [
+        (None, None),
+        ('application/json; indent=2', None),
+        (None, {'indent': 4}),
+    ])
+    @pytest.mark.parametrize('data', [PAYLOAD, FLOAT_PAYLOAD], ids=['payload', 'floats'])
+    def test_render_matches_drf(self, json_backend, data, accepted_media_type, renderer_context):
+        """Тестирование совпадения выдачи с JSONRenderer"""
+        expected = JSONRenderer().render(data, accepted_media_type, renderer_context)
+        assert ORJSONRenderer().render(data, accepted_media_type, renderer_context) == expected
+        assert b'\\u2028' in expected and b'"role_label":"\xd0\x90\xd0\xb4' in expected.replace(b' ', b'')
+
+    @pytest.mark.parametrize('value', [float('nan'), float('inf'), -float('inf')])
+    def test_render_non_finite(self, json_backend, value):
+        """Тестирование NaN и бесконечности: ошибка, как у JSONRenderer, а не null"""
+        data = {'results': [{'rating': value, 'last_review_at': None}]}
+        with pytest.raises(ValueError, match='Out of range float values'):
+            JSONRenderer().render(data)
+        with pytest.raises(ValueError, match='Out of range float values'):
+            ORJSONRenderer().render(data)
+        assert renderers.dumps(data) == renderers.encoder.encode(data).encode()
+
+    def test_render_none(self, json_backend):
+        """Тестирование пустого ответа"""
+        assert ORJSONRenderer().render(None) == b''
+
+    def test_dumps(self, json_backend):
+        """Тестирование компактного кодирования без экранирования ASCII"""
+        assert renderers.dumps({'title': 'Велосипед', 'price': Decimal('10.5')}) == \
+            '{"title":"Велосипед","price":10.5}'.encode()
+        assert renderers.dumps({'rating': [1e16, 1e-5]}) == b'{"rating":[1e+16,1e-05]}'
+
+    @pytest.mark.parametrize('content, encoding', [
+        ('{"title": "Велосипед", "tags": [1, 2.5, null]}', 'utf-8'),
+        ('{"title": "Велосипед", "tags": [1, 2.5, null]}', 'cp1251'),
+    ])
+    def test_parse(self, json_backend, content, encoding):
+        """Тестирование разбора тела запроса в заданной кодировке"""
+        context = {'encoding': encoding}
+        result = ORJSONParser().parse(io.BytesIO(content.encode(encoding)), parser_context=context)
+        assert result == JSONParser().parse(io.BytesIO(content.encode(encoding)), parser_context=context)
+
+    @pytest.mark.parametrize('content, encoding', [
+        ('{"id": 18446744073709551616, "ids": [-9223372036854775809, 1.5]}', 'utf-8'),
+        ('{"id": 18446744073709551616, "title": "Велосипед"}', 'cp1251'),
+    ])
+    def test_parse_big_integers(self, json_backend, content, encoding):
+        """Тестирование целых больше 64 бит: разбираются точно, а не как float"""
+        context = {'encoding': encoding}
+        result = ORJSONParser().parse(io.BytesIO(content.encode(encoding)), parser_context=context)
+        assert result == JSONParser().parse(io.BytesIO(content.encode(encoding)), parser_context=context)
+        assert result['id'] == 2 ** 64 and isinstance(result['id'], int)
+
+    @pytest.mark.parametrize('content', [b'{"title": ', b'{"price": NaN}', b'\xff'])
+    def test_parse_invalid(self, json_backend, content):
+        """Тестирование ошибки разбора некорректного JSON"""
+        with pytest.raises(ParseError, match='JSON parse error'):
+            ORJSONParser().parse(io.BytesIO(content))
+
+    @pytest.mark.django_db
+    def test_api(self, api_client, user_client, ads_users):
+        """Тестирование ответа и разбора запроса в API через рендерер и парсер из настроек"""
+        api_client.force_authenticate(user=user_client)
+        response = api_client.get(reverse('ads:ad_list'))
+        assert response.status_code == 200
+        assert response.content == JSONRenderer().render(response.data)
+        response = api_client.post(reverse('ads:ad_create'), data='{"title": "Велосипед", "price": 1000, '
+                                   '"description": "Почти новый"}', content_type='application/json')
+        assert response.status_code == 201
+        assert response.json()['title'] == 'Велосипед'
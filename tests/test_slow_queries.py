@@ -0,0 +1,98 @@
+import json
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import AsyncClient
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from config.slow_queries import get_fingerprint, logger, normalize_sql
+
+
+@pytest.fixture
+def slow_query_log(settings, tmp_path):
+    """Фикстура журнала, в который попадает каждый запрос, и с планом для каждого"""
+    settings.SLOW_QUERY_LOG_ENABLED = True
+    settings.SLOW_QUERY_THRESHOLD_MS = 0
+    settings.SLOW_QUERY_EXPLAIN_RATE = 1
+    settings.SLOW_QUERY_LOG_DIR = tmp_path
+    yield tmp_path
+    for handler in logger.handlers[:]:
+        handler.close()
+        logger.removeHandler(handler)
+
+
+def read_log(directory):
+    return [json.loads(line) for path in directory.iterdir() for line in path.read_text(encoding='utf-8').splitlines()]
+
+
+def test_normalize_sql():
+    """Тестирование нормализации: запросы с разными значениями получают один отпечаток"""
+    first = normalize_sql('SELECT * FROM "callboard_ad" WHERE "id" IN (1, 2, 3) AND "title" = \'a\' LIMIT 21')
+    second = normalize_sql('SELECT *  FROM "callboard_ad"\nWHERE "id" IN (%s, %s) AND "title" = %s LIMIT 5')
+    assert first == second == 'SELECT * FROM "callboard_ad" WHERE "id" IN (...) AND "title" = ? LIMIT ?'
+    assert get_fingerprint(first) == get_fingerprint(second)
+
+
+@pytest.mark.django_db
+class TestSlowQueryLog:
+    """Тестирование журнала медленных запросов"""
+
+    def test_select_with_plan(self, slow_query_log, ads_users):
+        """Тестирование записи SELECT с маршрутом и планом EXPLAIN ANALYZE"""
+        response = APIClient().get(reverse('ads:ad_list'), data={'pagination': 'page'})
+        assert response.status_code == 200
+        entries = read_log(slow_query_log)
+        assert entries
+        for entry in entries:
+            assert entry['view'] == 'ads:ad_list'
+            assert entry['sql'].startswith('SELECT')
+            assert 'Actual Total Time' in entry['plan'][0]['Plan']
+            assert set(entry) == {'time', 'duration_ms', 'view', 'fingerprint', 'sql', 'plan'}
+
+    def test_write_without_plan(self, slow_query_log, user_client):
+        """Тестирование записи изменяющего запроса: он не выполняется повторно ради плана"""
+        client = APIClient()
+        client.force_authenticate(user=user_client)
+        response = client.post(reverse('ads:ad_create'), data={
+            "title": "Велосипед", "price": 1000, "description": "Описание",
+        }, format='json')
+        assert response.status_code == 201
+        insert, = [entry for entry in read_log(slow_query_log) if entry['sql'].startswith('INSERT')]
+        assert insert['view'] == 'ads:ad_create'
+        assert insert['plan'] is None
+
+    def test_async_view(self, slow_query_log, ads_users):
+        """Тестирование асинхронной цепочки: запросы через sync_to_async записываются с маршрутом"""
+        response = async_to_sync(AsyncClient().get)(reverse('ads:ad_list_async'))
+        assert response.status_code == 200
+        entries = read_log(slow_query_log)
+        assert entries
+        assert {entry['view'] for entry in entries} == {'ads:ad_list_async'}
+
+    def test_streaming_response(self, slow_query_log, user_client, ads_users):
+        """Тестирование потоковой выгрузки: запрос, выполненный при чтении тела, записывается с маршрутом"""
+        client = APIClient()
+        client.force_authenticate(user=user_client)
+        response = client.get(reverse('ads:ad_export'))
+        assert response.status_code == 200
+        assert not [entry for entry in read_log(slow_query_log) if 'callboard_ad' in entry['sql']]
+        b''.join(response.streaming_content)
+        export, = [entry for entry in read_log(slow_query_log) if 'callboard_ad' in entry['sql']]
+        assert export['view'] == 'ads:ad_export'
+
+    def test_report(self, tmp_path, capsys):
+        """Тестирование отчета: отпечатки по убыванию суммарного времени с самым медленным планом"""
+        entries = [
+            {'duration_ms': 300, 'view': 'ads:ad_list', 'fingerprint': 'a', 'sql': 'SELECT a', 'plan': None},
+            {'duration_ms': 250, 'view': 'ads:ad_list', 'fingerprint': 'b', 'sql': 'SELECT b', 'plan': [{'n': 1}]},
+            {'duration_ms': 400, 'view': 'ads:ad_detail', 'fingerprint': 'b', 'sql': 'SELECT b', 'plan': [{'n': 2}]},
+        ]
+        (tmp_path / 'slow_queries-1.jsonl').write_text(''.join(json.dumps(entry) + '\n' for entry in entries))
+        call_command('slow_query_report', dir=str(tmp_path), limit=1, plans=True)
+        output = capsys.readouterr().out
+        assert output.startswith('1. b: всего 650 мс, 2 раз')
+        assert 'маршруты: ads:ad_list (1), ads:ad_detail (1)' in output
+        assert '"n": 2' in output
+        assert 'SELECT a' not in output
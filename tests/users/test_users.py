@@ -1,10 +1,29 @@
+from datetime import timedelta
+
 import pytest
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends import locmem
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
 from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
 
 from tests.conftest import UserFactory
-from users.models import User
+from users.authentication import (USER_CACHE_TOMBSTONE,
+                                  CachedJWTAuthentication, get_user_cache_key)
+from users.models import EmailOutbox, User
 from users.serializers import UserRetrieveSerializer
+from users.services import (LAST_LOGIN_DUE_KEY, LAST_LOGIN_LOCK_KEY,
+                            LAST_LOGIN_SEQ_KEY, enqueue_email, flush_logins,
+                            record_login)
 
 
 @pytest.mark.django_db
@@ -161,9 +180,18 @@ class TestUsers:
         assert response.status_code == expected_status
         if expected_status == 200:
             assert response.data["detail"] == expected_detail
+            assert EmailOutbox.objects.filter(recipients=[email]).count() == 1
         else:
             if "email" in response.data:
                 assert expected_detail in response.data["email"]
+            assert not EmailOutbox.objects.exists()
+        assert mail.outbox == []
+
+    def test_user_password_reset_queries(self, api_client, user_client, django_assert_num_queries):
+        """Тестирование сброса пароля: в запросе только поиск пользователя и одна вставка в очередь писем"""
+        with django_assert_num_queries(2):
+            response = api_client.post(reverse('users:password_reset'), data={"email": user_client.email})
+        assert response.status_code == 200
 
     @pytest.mark.parametrize("uid, token, new_password, expected_status, expected_detail", [
         ("valid_uid", "valid_token", "newpassword123", 200, "Пароль успешно сброшен!"),
@@ -195,6 +223,18 @@ class TestUsers:
         else:
             assert expected_detail in str(response.data)
 
+    @pytest.mark.parametrize("method, url_name", [
+        ("patch", "users:user_update"),
+        ("delete", "users:user_delete"),
+    ])
+    def test_user_write_forbidden_queries(self, api_client, user_client, user_admin, method, url_name,
+                                          django_assert_num_queries):
+        """Тестирование отказа в изменении чужого профиля одним запросом: права проверяются по pk"""
+        api_client.force_authenticate(user=user_client)
+        with django_assert_num_queries(1):
+            response = getattr(api_client, method)(reverse(url_name, kwargs={'pk': user_admin.pk}))
+        assert response.status_code == 403
+
 
 @pytest.mark.django_db
 class TestUsersModel:
@@ -204,3 +244,269 @@ class TestUsersModel:
         """Тестирование метода str у модели User"""
         ad = User.objects.get(pk=user_client.pk)
         assert str(ad) == user_client.email
+
+
+@pytest.mark.django_db
+class TestCachedJWTAuthentication:
+    """Тестирование JWT-аутентификации с пользователем из кэша"""
+
+    def get_profile(self, api_client, user):
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        with CaptureQueriesContext(connection) as context:
+            response = api_client.get(reverse('users:user_detail', kwargs={'pk': user.pk}))
+        return response, len(context.captured_queries)
+
+    def test_user_from_cache(self, api_client, user_client):
+        """Тестирование повторного запроса: пользователь берется из кэша без запроса к БД"""
+        cache.delete(get_user_cache_key(user_client.pk))  # метка инвалидации после создания пользователя
+        response, first_queries = self.get_profile(api_client, user_client)
+        assert response.status_code == 200
+        response, second_queries = self.get_profile(api_client, user_client)
+        assert response.status_code == 200
+        assert second_queries == first_queries - 1
+
+    def test_user_changes_invalidate_cache(self, api_client, user_client):
+        """Тестирование сброса кэша: изменения пользователя и is_active действуют сразу"""
+        cache.delete(get_user_cache_key(user_client.pk))
+        self.get_profile(api_client, user_client)
+        user_client.first_name = 'Новое имя'
+        user_client.save()
+        response, _ = self.get_profile(api_client, user_client)
+        assert response.data['first_name'] == 'Новое имя'
+
+        user_client.is_active = False
+        user_client.save()
+        response, _ = self.get_profile(api_client, user_client)
+        assert response.status_code == 401
+
+    def test_deleted_user_invalidates_cache(self, api_client, user_client):
+        """Тестирование сброса кэша при удалении пользователя"""
+        cache.delete(get_user_cache_key(user_client.pk))
+        self.get_profile(api_client, user_client)
+        User.objects.filter(pk=user_client.pk).delete()
+        response, _ = self.get_profile(api_client, user_client)
+        assert response.status_code == 401
+
+    def test_stale_snapshot_not_cached_after_invalidation(self, user_client):
+        """Тестирование метки инвалидации: снимок, прочитанный до изменения, не попадает в кэш"""
+        authentication = CachedJWTAuthentication()
+        stale_snapshot = authentication.make_snapshot(user_client)
+        user_client.save()
+        cache.add(get_user_cache_key(user_client.pk), stale_snapshot)
+        assert cache.get(get_user_cache_key(user_client.pk)) == USER_CACHE_TOMBSTONE
+
+    def test_snapshot_without_password(self, monkeypatch, api_client, user_client, django_assert_num_queries):
+        """Тестирование снимка: пароля в кэше нет, отзыв токена проверяется по хешу пароля из снимка"""
+        monkeypatch.setattr(api_settings, 'CHECK_REVOKE_TOKEN', True)
+        cache.delete(get_user_cache_key(user_client.pk))
+        assert self.get_profile(api_client, user_client)[0].status_code == 200
+        field_names, values, password_hash = cache.get(get_user_cache_key(user_client.pk))
+        assert 'password' not in field_names
+        assert user_client.password not in values
+        assert password_hash == get_md5_hash_password(user_client.password)
+
+        token = AccessToken.for_user(user_client)
+        token[api_settings.REVOKE_TOKEN_CLAIM] = get_md5_hash_password('старый пароль')
+        with django_assert_num_queries(0):
+            with pytest.raises(AuthenticationFailed):
+                CachedJWTAuthentication().get_user(token)
+
+    def test_user_without_shared_cache(self, settings, api_client, user_client):
+        """Тестирование аутентификации без общего кэша: пользователь читается из БД на каждый запрос"""
+        settings.SHARED_CACHE = False
+        cache.delete(get_user_cache_key(user_client.pk))
+        response, first_queries = self.get_profile(api_client, user_client)
+        assert response.status_code == 200
+        response, second_queries = self.get_profile(api_client, user_client)
+        assert response.status_code == 200
+        assert second_queries == first_queries
+        assert cache.get(get_user_cache_key(user_client.pk)) is None
+
+
+@pytest.mark.django_db
+class TestLastLogin:
+    """Тестирование пакетной записи времени входа"""
+
+    def obtain_token(self, api_client, user):
+        return api_client.post(reverse('users:token_obtain_pair'), data={"email": user.email, "password": "password"})
+
+    def test_token_obtain_batches_last_login(self, api_client, user_client, user_admin):
+        """Тестирование получения токена: время входа сбрасывается в БД не чаще раза в интервал"""
+        assert self.obtain_token(api_client, user_client).status_code == 200
+        user_client.refresh_from_db()
+        assert user_client.last_login is not None
+
+        with CaptureQueriesContext(connection) as context:
+            assert self.obtain_token(api_client, user_admin).status_code == 200
+        assert not [query for query in context.captured_queries if query['sql'].startswith('UPDATE')]
+        user_admin.refresh_from_db()
+        assert user_admin.last_login is None
+
+        call_command('flush_last_login')
+        user_admin.refresh_from_db()
+        assert user_admin.last_login is not None
+
+    def test_flush_logins_single_update(self, user_client, user_admin, django_assert_num_queries):
+        """Тестирование сброса журнала одним UPDATE с последним временем входа каждого пользователя"""
+        cache.add(LAST_LOGIN_DUE_KEY, 1)
+        for user in (user_client, user_admin, user_client):
+            record_login(user)
+        with django_assert_num_queries(1):
+            assert flush_logins() == 3
+        user_client.refresh_from_db()
+        user_admin.refresh_from_db()
+        assert user_client.last_login > user_admin.last_login
+        assert flush_logins() == 0
+
+    def test_flush_logins_retry(self, monkeypatch, user_client):
+        """Тестирование повторного сброса журнала после ошибки записи в БД"""
+        cache.add(LAST_LOGIN_DUE_KEY, 1)
+        record_login(user_client)
+
+        def update(self, **kwargs):
+            raise DatabaseError('БД недоступна')
+
+        with monkeypatch.context() as patch:
+            patch.setattr(QuerySet, 'update', update)
+            with pytest.raises(DatabaseError):
+                flush_logins()
+        user_client.refresh_from_db()
+        assert user_client.last_login is None
+
+        assert flush_logins() == 1
+        user_client.refresh_from_db()
+        assert user_client.last_login is not None
+
+    def test_flush_logins_gap(self, monkeypatch, user_client):
+        """Тестирование сброса журнала с пропущенной записью: ожидание дозаписи, затем пропуск"""
+        cache.add(LAST_LOGIN_DUE_KEY, 1)
+        cache.add(LAST_LOGIN_SEQ_KEY, 0, timeout=None)
+        cache.incr(LAST_LOGIN_SEQ_KEY)
+        record_login(user_client)
+        assert flush_logins() == 0
+
+        monkeypatch.setattr('users.services.LAST_LOGIN_GAP_TIMEOUT', -1)
+        assert flush_logins() == 2
+        user_client.refresh_from_db()
+        assert user_client.last_login is not None
+
+    def test_flush_logins_gap_range(self, monkeypatch, user_client):
+        """Тестирование сброса журнала после вытеснения записей: весь пропуск пропускается за один сброс"""
+        cache.add(LAST_LOGIN_DUE_KEY, 1)
+        cache.set(LAST_LOGIN_SEQ_KEY, 5, timeout=None)
+        record_login(user_client)
+        assert flush_logins(batch_size=2) == 0
+
+        monkeypatch.setattr('users.services.LAST_LOGIN_GAP_TIMEOUT', -1)
+        assert flush_logins(batch_size=2) == 6
+        user_client.refresh_from_db()
+        assert user_client.last_login is not None
+
+    def test_flush_logins_max_batches(self, user_client, user_admin):
+        """Тестирование ограничения работы одного сброса: остаток журнала сбрасывается следующим"""
+        cache.add(LAST_LOGIN_DUE_KEY, 1)
+        for user in (user_client, user_admin, user_client):
+            record_login(user)
+        assert flush_logins(batch_size=2, max_batches=1) == 2
+        assert flush_logins(batch_size=2, max_batches=1) == 1
+        assert flush_logins(batch_size=2, max_batches=1) == 0
+
+    def test_flush_logins_foreign_lock(self, monkeypatch, user_client):
+        """Тестирование сброса журнала: истекшая блокировка, занятая другим процессом, не снимается"""
+        cache.add(LAST_LOGIN_DUE_KEY, 1)
+        record_login(user_client)
+        update = QuerySet.update
+
+        def update_after_lock_expired(self, **kwargs):
+            cache.set(LAST_LOGIN_LOCK_KEY, 'другой процесс')
+            return update(self, **kwargs)
+
+        monkeypatch.setattr(QuerySet, 'update', update_after_lock_expired)
+        assert flush_logins() == 1
+        assert cache.get(LAST_LOGIN_LOCK_KEY) == 'другой процесс'
+
+    def test_record_login_without_shared_cache(self, settings, user_client, django_assert_num_queries):
+        """Тестирование записи времени входа без общего кэша: сразу в БД, без журнала"""
+        settings.SHARED_CACHE = False
+        with django_assert_num_queries(1):
+            record_login(user_client)
+        assert cache.get(LAST_LOGIN_SEQ_KEY) is None
+        user_client.refresh_from_db()
+        assert user_client.last_login is not None
+
+
+@pytest.mark.django_db
+class TestEmailOutbox:
+    """Тестирование очереди писем"""
+
+    def test_send_outbox(self, user_client):
+        """Тестирование отправки писем из очереди через одно соединение"""
+        first = enqueue_email('Сброс пароля', 'Ссылка', [user_client.email])
+        second = enqueue_email('Сброс пароля', 'Ссылка', ['other@example.com'])
+        postponed = enqueue_email('Сброс пароля', 'Ссылка', ['later@example.com'])
+        EmailOutbox.objects.filter(pk=postponed.pk).update(next_attempt_at=timezone.now() + timedelta(hours=1))
+
+        call_command('send_outbox', batch_size=10)
+        assert [message.to for message in mail.outbox] == [[user_client.email], ['other@example.com']]
+        for email in (first, second):
+            email.refresh_from_db()
+            assert email.status == EmailOutbox.StatusChoices.SENT
+            assert email.attempts == 1
+            assert email.sent_at is not None
+        postponed.refresh_from_db()
+        assert postponed.status == EmailOutbox.StatusChoices.PENDING
+
+        call_command('send_outbox')
+        assert len(mail.outbox) == 2
+
+    def test_send_outbox_retry(self, monkeypatch, user_client):
+        """Тестирование повторных попыток с растущей задержкой и отказа после исчерпания попыток"""
+        def send_messages(self, messages):
+            raise ConnectionResetError('SMTP недоступен')
+
+        monkeypatch.setattr(locmem.EmailBackend, 'send_messages', send_messages)
+        email = enqueue_email('Сброс пароля', 'Ссылка', [user_client.email])
+
+        call_command('send_outbox', max_attempts=3, retry_delay=60)
+        email.refresh_from_db()
+        assert email.status == EmailOutbox.StatusChoices.PENDING
+        assert email.attempts == 1
+        assert 'SMTP недоступен' in email.last_error
+        assert timedelta(seconds=55) < email.next_attempt_at - timezone.now() <= timedelta(seconds=60)
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        call_command('send_outbox', max_attempts=3, retry_delay=60)
+        email.refresh_from_db()
+        assert email.attempts == 2
+        assert timedelta(seconds=115) < email.next_attempt_at - timezone.now() <= timedelta(seconds=120)
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now())
+        call_command('send_outbox', max_attempts=3, retry_delay=60)
+        email.refresh_from_db()
+        assert email.status == EmailOutbox.StatusChoices.FAILED
+        assert email.attempts == 3
+        assert mail.outbox == []
+
+    def test_send_outbox_message_error(self, monkeypatch, user_client):
+        """Тестирование сохранения статуса каждого письма при ошибке отправки одного из них"""
+        send_messages = locmem.EmailBackend.send_messages
+
+        def send_or_fail(self, messages):
+            if messages[0].to == ['bad@example.com']:
+                raise ValueError('Некорректный адрес')
+            return send_messages(self, messages)
+
+        monkeypatch.setattr(locmem.EmailBackend, 'send_messages', send_or_fail)
+        bad = enqueue_email('Сброс пароля', 'Ссылка', ['bad@example.com'])
+        good = enqueue_email('Сброс пароля', 'Ссылка', [user_client.email])
+
+        call_command('send_outbox', max_attempts=3)
+        assert [message.to for message in mail.outbox] == [[user_client.email]]
+        bad.refresh_from_db()
+        assert bad.status == EmailOutbox.StatusChoices.PENDING
+        assert 'ValueError: Некорректный адрес' in bad.last_error
+        good.refresh_from_db()
+        assert good.status == EmailOutbox.StatusChoices.SENT
+
+        call_command('send_outbox', max_attempts=3)
+        assert len(mail.outbox) == 1
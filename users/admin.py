@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from users.models import User
+from users.models import EmailOutbox, User
 
 
 @admin.register(User)
@@ -8,3 +8,9 @@ class UserAdmin(admin.ModelAdmin):
     list_display = ('pk', 'first_name', 'last_name', 'email', 'phone', 'role', 'is_active',)
     list_filter = ('is_active', 'role',)
     search_fields = ('email', 'phone',)
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at',)
+    list_filter = ('status',)
@@ -0,0 +1,124 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (AuthenticationFailed,
+                                                 InvalidToken)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# Метка инвалидированной записи: пока она в кэше, cache.add не сохранит снимок, прочитанный до изменения
+USER_CACHE_TOMBSTONE = 'invalidated'
+USER_CACHE_TOMBSTONE_TIMEOUT = 5
+
+
+def get_user_cache_key(user_id):
+    return f'users:auth:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    """
+    Сбрасывает снимок пользователя сразу и повторно после фиксации транзакции.
+    Вызывается сигналами модели, после QuerySet.update() пользователей его нужно вызвать явно
+    """
+    def set_tombstone():
+        cache.set(get_user_cache_key(user_id), USER_CACHE_TOMBSTONE, timeout=USER_CACHE_TOMBSTONE_TIMEOUT)
+
+    set_tombstone()
+    transaction.on_commit(set_tombstone)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT-аутентификация с пользователем из кэша.
+    Снимок полей пользователя хранится AUTH_USER_CACHE_TIMEOUT секунд и сбрасывается
+    сигналами post_save/post_delete, поэтому изменения is_active действуют сразу.
+    QuerySet.update() сигналов не отправляет: без вызова invalidate_cached_user
+    изменения через него видны только после истечения снимка.
+    Пароль в снимок не попадает, хранится только его хеш для проверки отзыва токена.
+    Без общего кэша (SHARED_CACHE) пользователь читается из БД: сброс снимка
+    в LocMemCache дошел бы только до одного процесса
+    """
+
+    def get_user(self, validated_token):
+        if not settings.SHARED_CACHE:
+            return super().get_user(validated_token)
+
+        user_id = self.get_user_id(validated_token)
+        key = get_user_cache_key(user_id)
+        snapshot = cache.get(key)
+        if isinstance(snapshot, tuple):
+            return self.check_user(*self.load_snapshot(snapshot), validated_token)
+
+        user = self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            cache.add(key, self.make_snapshot(user), timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        return self.check_user(user, None, validated_token)
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+    def check_user(self, user, password_hash, validated_token):
+        """Проверки JWTAuthentication.get_user; password_hash - хеш пароля из снимка или None"""
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if password_hash is None:
+                password_hash = get_md5_hash_password(user.password)
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_hash:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+    def make_snapshot(self, user):
+        fields = [field for field in self.user_model._meta.concrete_fields if field.attname != 'password']
+        return (tuple(field.attname for field in fields), tuple(getattr(user, field.attname) for field in fields),
+                get_md5_hash_password(user.password))
+
+    def load_snapshot(self, snapshot):
+        """Пользователь из снимка с отложенным полем пароля и хеш пароля"""
+        field_names, values, password_hash = snapshot
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, field_names, values), password_hash
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    JWT-аутентификация для асинхронных эндпоинтов.
+    Токен проверяется так же, как в CachedJWTAuthentication, а кэш и пользователь читаются асинхронно
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        users = self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+        if not settings.SHARED_CACHE:
+            return self.check_user(await users.afirst(), None, validated_token)
+
+        key = get_user_cache_key(user_id)
+        snapshot = await cache.aget(key)
+        if isinstance(snapshot, tuple):
+            return self.check_user(*self.load_snapshot(snapshot), validated_token)
+
+        user = await users.afirst()
+        if user is not None:
+            await cache.aadd(key, self.make_snapshot(user), timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        return self.check_user(user, None, validated_token)
@@ -0,0 +1,11 @@
+from django.core.management import BaseCommand
+
+from users.services import flush_logins
+
+
+class Command(BaseCommand):
+    """Сброс журнала входов пользователей в БД"""
+
+    def handle(self, *args, **options):
+        flushed = flush_logins()
+        self.stdout.write(f'Обработано записей журнала входов: {flushed}.')
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management import BaseCommand
+
+from users.services import send_outbox_batch
+
+
+class Command(BaseCommand):
+    """Отправка писем из очереди с повторными попытками"""
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Количество писем в одном пакете')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Количество попыток отправки письма')
+        parser.add_argument('--retry-delay', type=int, default=60, help='Задержка перед первой повторной попыткой, сек')
+        parser.add_argument('--max-retry-delay', type=int, default=3600,
+                            help='Максимальная задержка между попытками, сек')
+        parser.add_argument('--loop', action='store_true', help='Не завершаться, а опрашивать очередь')
+        parser.add_argument('--interval', type=float, default=5, help='Пауза между опросами пустой очереди, сек')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, failed = send_outbox_batch(options['batch_size'], options['max_attempts'],
+                                             options['retry_delay'], options['max_retry_delay'])
+            if sent or failed:
+                self.stdout.write(f'Отправлено писем: {sent}, с ошибкой: {failed}.')
+            if not options['loop']:
+                break
+            if sent + failed < options['batch_size']:
+                time.sleep(options['interval'])
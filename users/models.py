@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext as _
 
 NULLABLE = {"null": True, "blank": True}
@@ -30,3 +31,35 @@ class User(AbstractUser):
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+
+
+class EmailOutbox(models.Model):
+    """Модель письма в очереди на отправку"""
+
+    class StatusChoices(models.TextChoices):
+        PENDING = 'pending', _('Ожидает отправки')
+        SENT = 'sent', _('Отправлено')
+        FAILED = 'failed', _('Не отправлено')
+
+    subject = models.CharField(max_length=255, verbose_name='Тема')
+    body = models.TextField(verbose_name='Текст')
+    from_email = models.CharField(max_length=254, **NULLABLE, verbose_name='Отправитель')
+    recipients = models.JSONField(verbose_name='Получатели')
+    status = models.CharField(max_length=10, choices=StatusChoices, default=StatusChoices.PENDING,
+                              verbose_name='Статус')
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='Количество попыток')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Время следующей попытки')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата и время создания')
+    sent_at = models.DateTimeField(**NULLABLE, verbose_name='Дата и время отправки')
+
+    def __str__(self):
+        return self.subject
+
+    class Meta:
+        verbose_name = 'Письмо'
+        verbose_name_plural = 'Очередь писем'
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'),
+                         name='outbox_pending_idx'),
+        ]
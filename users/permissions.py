@@ -6,12 +6,15 @@ class IsOwnerOrAdmin(BasePermission):
     message = "Доступ запрещен! Данное действие доступно владельцу или администратору!"
 
     def has_object_permission(self, request, view, obj):
-        return request.user == obj or request.user.is_superuser
+        return request.user.pk == obj.pk or request.user.is_superuser
 
 
 class IsAutor(BasePermission):
-    """Проверка на автора, администратора объявления, комментария"""
+    """
+    Проверка на автора, администратора объявления, комментария.
+    Сравнивается author_id, поэтому строка автора не загружается
+    """
     message = "Доступ запрещен! Данное действие доступно автору или администратору!"
 
     def has_object_permission(self, request, view, obj):
-        return request.user == obj.author or request.user.is_superuser
+        return request.user.pk == obj.author_id or request.user.is_superuser
@@ -1,11 +1,12 @@
 from django.conf import settings
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from users.models import User
+from users.services import enqueue_email, record_login
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -39,21 +40,20 @@ class UserPasswordResetSerializer(serializers.Serializer):
     email = serializers.EmailField()
 
     def validate_email(self, value):
-        if not User.objects.filter(email=value).exists():
+        self.user = User.objects.filter(email=value).first()
+        if self.user is None:
             raise serializers.ValidationError("Email не зарегистрирован.")
         return value
 
     def save(self):
-        email = self.validated_data['email']
-        user = User.objects.get(email=email)
-        uid = urlsafe_base64_encode(force_bytes(user.pk))
-        token = default_token_generator.make_token(user)
+        """Ставит письмо со ссылкой в очередь, отправляет его команда send_outbox"""
+        uid = urlsafe_base64_encode(force_bytes(self.user.pk))
+        token = default_token_generator.make_token(self.user)
         reset_link = settings.PASSWORD_RESET_CONFIRM_URL.format(uid=uid, token=token)
-        send_mail(
+        enqueue_email(
             'Сброс пароля',
             f'Перейдите по следующей ссылке, чтобы сбросить пароль: {reset_link}',
-            settings.DEFAULT_FROM_EMAIL,
-            [user.email],
+            [self.user.email],
         )
 
 
@@ -85,3 +85,12 @@ class UserPasswordResetConfirmSerializer(serializers.Serializer):
         user = User.objects.get(pk=user_id)
         user.set_password(new_password)
         user.save()
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Класс сериализатор получения токенов, записывающий время входа в журнал вместо UPDATE"""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_login(self.user)
+        return data
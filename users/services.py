@@ -0,0 +1,215 @@
+import atexit
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Case, DateTimeField, Value, When
+from django.utils import timezone
+
+from users.models import EmailOutbox, User
+
+LAST_LOGIN_SEQ_KEY = 'users:last_login:seq'
+LAST_LOGIN_FLUSHED_KEY = 'users:last_login:flushed'
+LAST_LOGIN_LOCK_KEY = 'users:last_login:lock'
+LAST_LOGIN_DUE_KEY = 'users:last_login:due'
+LAST_LOGIN_GAP_KEY = 'users:last_login:gap_range'
+LAST_LOGIN_LOCK_TIMEOUT = 30
+# Через сколько секунд отсутствующая запись журнала считается вытесненной из кэша, а не еще не записанной
+LAST_LOGIN_GAP_TIMEOUT = 60
+
+# Через сколько секунд письмо, взятое обработчиком, но не отмеченное отправленным, снова попадает в очередь
+OUTBOX_CLAIM_TIMEOUT = 10 * 60
+OUTBOX_STATUS_FIELDS = ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+
+_flush_at_exit_registered = False
+
+
+def enqueue_email(subject, body, recipients, from_email=None):
+    """Ставит письмо в очередь на отправку одним INSERT"""
+    return EmailOutbox.objects.create(subject=subject, body=body, recipients=list(recipients),
+                                      from_email=from_email or settings.DEFAULT_FROM_EMAIL)
+
+
+def get_retry_delay(attempts, base_delay, max_delay):
+    """Задержка перед следующей попыткой: растет экспоненциально и ограничена сверху"""
+    return timedelta(seconds=min(base_delay * 2 ** (attempts - 1), max_delay))
+
+
+def mark_sent(email):
+    email.attempts += 1
+    email.status = EmailOutbox.StatusChoices.SENT
+    email.sent_at = timezone.now()
+    email.last_error = ''
+
+
+def mark_failed(email, error, max_attempts, base_delay, max_delay):
+    email.attempts += 1
+    email.last_error = f'{type(error).__name__}: {error}'
+    if email.attempts >= max_attempts:
+        email.status = EmailOutbox.StatusChoices.FAILED
+    else:
+        email.next_attempt_at = timezone.now() + get_retry_delay(email.attempts, base_delay, max_delay)
+
+
+def claim_outbox_batch(batch_size):
+    """
+    Выбирает пакет писем, срок отправки которых наступил, и откладывает их на OUTBOX_CLAIM_TIMEOUT.
+    Строки блокируются с SKIP LOCKED только на время выбора, поэтому несколько обработчиков
+    не возьмут одно письмо, а письма упавшего обработчика вернутся в очередь после таймаута
+    """
+    with transaction.atomic():
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status=EmailOutbox.StatusChoices.PENDING, next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if emails:
+            next_attempt_at = timezone.now() + timedelta(seconds=OUTBOX_CLAIM_TIMEOUT)
+            EmailOutbox.objects.filter(pk__in=[email.pk for email in emails]).update(next_attempt_at=next_attempt_at)
+    return emails
+
+
+def send_outbox_batch(batch_size, max_attempts, base_delay, max_delay):
+    """
+    Отправляет пакет писем, срок отправки которых наступил, через одно SMTP-соединение.
+    Статус каждого письма сохраняется сразу после попытки отправки, поэтому ошибка на одном письме
+    не откатывает и не отправляет повторно уже отправленные.
+    Возвращает количество отправленных и неотправленных писем
+    """
+    sent = failed = 0
+    emails = claim_outbox_batch(batch_size)
+    if not emails:
+        return sent, failed
+
+    connection = get_connection()
+    try:
+        for index, email in enumerate(emails):
+            try:
+                connection.open()
+            except OSError as error:
+                # Сервер недоступен: остальные письма пакета откладываются без новых попыток соединения
+                for pending_email in emails[index:]:
+                    mark_failed(pending_email, error, max_attempts, base_delay, max_delay)
+                    pending_email.save(update_fields=OUTBOX_STATUS_FIELDS)
+                failed += len(emails) - index
+                break
+            message = EmailMessage(email.subject, email.body, email.from_email, email.recipients,
+                                   connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception as error:
+                # Соединение после ошибки может быть разорвано, следующее письмо откроет новое
+                connection.close()
+                mark_failed(email, error, max_attempts, base_delay, max_delay)
+                failed += 1
+            else:
+                mark_sent(email)
+                sent += 1
+            email.save(update_fields=OUTBOX_STATUS_FIELDS)
+    finally:
+        connection.close()
+    return sent, failed
+
+
+def get_last_login_entry_key(seq):
+    return f'users:last_login:{seq}'
+
+
+def record_login(user):
+    """
+    Записывает время входа пользователя в журнал в кэше вместо UPDATE на каждый вход.
+    Не чаще раза в LAST_LOGIN_FLUSH_INTERVAL секунд в текущем запросе сбрасывается один пакет журнала,
+    чтобы накопившийся журнал не задерживал вход; остаток сбрасывают следующие входы и flush_last_login.
+    Без общего кэша (SHARED_CACHE) время входа пишется в БД сразу: журнал в LocMemCache
+    виден только своему процессу и теряется при его остановке
+    """
+    global _flush_at_exit_registered
+    if not settings.SHARED_CACHE:
+        update_last_login(None, user)
+        return
+    user.last_login = timezone.now()
+    cache.add(LAST_LOGIN_SEQ_KEY, 0, timeout=None)
+    try:
+        seq = cache.incr(LAST_LOGIN_SEQ_KEY)
+    except ValueError:
+        cache.add(LAST_LOGIN_SEQ_KEY, 0, timeout=None)
+        seq = cache.incr(LAST_LOGIN_SEQ_KEY)
+    cache.set(get_last_login_entry_key(seq), (user.pk, user.last_login), timeout=None)
+
+    if not _flush_at_exit_registered:
+        atexit.register(flush_logins)
+        _flush_at_exit_registered = True
+    if cache.add(LAST_LOGIN_DUE_KEY, 1, timeout=settings.LAST_LOGIN_FLUSH_INTERVAL):
+        flush_logins(max_batches=1)
+
+
+def get_lost_range_end(seq, issued):
+    """
+    Последний номер пропуска журнала, начатого с записи seq, если записи отсутствуют дольше
+    LAST_LOGIN_GAP_TIMEOUT секунд, иначе 0. Пропуск запоминается диапазоном до последнего выданного номера issued:
+    к концу таймаута все его записи должны были дописаться, поэтому после таймаута отсутствующие записи
+    диапазона пропускаются сразу, а не по одной за таймаут, например после вытеснения номера сброшенной записи
+    """
+    gap = cache.get(LAST_LOGIN_GAP_KEY)
+    if gap is None or not gap[0] <= seq <= gap[1]:
+        cache.set(LAST_LOGIN_GAP_KEY, (seq, issued, time.time()), timeout=None)
+        return 0
+    return gap[1] if time.time() - gap[2] > LAST_LOGIN_GAP_TIMEOUT else 0
+
+
+def flush_logins(batch_size=1000, max_batches=None):
+    """
+    Сбрасывает журнал входов в БД одним UPDATE на пакет записей, не больше max_batches пакетов за вызов.
+    Номер последней сброшенной записи сдвигается только после UPDATE, поэтому при сбое
+    записи будут сброшены повторно, но не потеряны. Возвращает количество обработанных записей
+    """
+    lock_token = uuid.uuid4().hex
+    if not cache.add(LAST_LOGIN_LOCK_KEY, lock_token, timeout=LAST_LOGIN_LOCK_TIMEOUT):
+        return 0
+    total = batches = 0
+    try:
+        while max_batches is None or batches < max_batches:
+            seq = cache.get(LAST_LOGIN_SEQ_KEY, 0)
+            flushed = cache.get(LAST_LOGIN_FLUSHED_KEY, 0)
+            if flushed > seq:
+                # Счетчик журнала был вытеснен из кэша и начат заново
+                flushed = 0
+            keys = [get_last_login_entry_key(n) for n in range(flushed + 1, min(seq, flushed + batch_size) + 1)]
+            entries = cache.get_many(keys)
+
+            logins = {}
+            last = flushed
+            lost_until = 0
+            for n, key in enumerate(keys, start=flushed + 1):
+                entry = entries.get(key)
+                if entry is None and n > lost_until:
+                    lost_until = get_lost_range_end(n, seq)
+                    if not lost_until:
+                        # Запись еще может дописываться: номер уже выдан, а значение не сохранено
+                        break
+                last = n
+                if entry is not None:
+                    user_id, logged_at = entry
+                    logins[user_id] = max(logged_at, logins.get(user_id, logged_at))
+            if last == flushed:
+                return total
+
+            if logins:
+                User.objects.filter(pk__in=logins).update(last_login=Case(
+                    *(When(pk=user_id, then=Value(logged_at)) for user_id, logged_at in logins.items()),
+                    output_field=DateTimeField(),
+                ))
+            cache.set(LAST_LOGIN_FLUSHED_KEY, last, timeout=None)
+            cache.delete_many(keys[:last - flushed])
+            total += last - flushed
+            batches += 1
+        return total
+    finally:
+        # Блокировка могла истечь и достаться другому процессу, ее снимает только владелец
+        if cache.get(LAST_LOGIN_LOCK_KEY) == lock_token:
+            cache.delete(LAST_LOGIN_LOCK_KEY)
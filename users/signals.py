@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+
+from users.authentication import invalidate_cached_user
+from users.models import User
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_snapshot(sender, instance, **kwargs):
+    """Сбрасывает закэшированный для аутентификации снимок пользователя при изменении или удалении"""
+    invalidate_cached_user(getattr(instance, api_settings.USER_ID_FIELD))
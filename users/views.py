@@ -1,6 +1,7 @@
 from rest_framework import generics, response, status
 from rest_framework.permissions import AllowAny
 
+from callboard.cache import invalidate_ad_list
 from users.models import User
 from users.permissions import IsOwnerOrAdmin
 from users.serializers import (UserPasswordResetConfirmSerializer,
@@ -42,10 +43,14 @@ class UserRetrieveAPIView(generics.RetrieveAPIView):
 
 
 class UserDestroyAPIView(generics.DestroyAPIView):
-    """Эндпоинт удаления пользователя"""
+    """Эндпоинт удаления пользователя вместе с его объявлениями"""
     queryset = User.objects.all()
     permission_classes = [IsOwnerOrAdmin]
 
+    def perform_destroy(self, instance):
+        instance.delete()
+        invalidate_ad_list()
+
 
 class UserPasswordResetAPIView(generics.GenericAPIView):
     """Эндпоинт для сброса пароля пользователя"""